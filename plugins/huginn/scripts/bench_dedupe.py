@@ -0,0 +1,297 @@
+#!/usr/bin/env python3
+"""
+Caption Deduplicator Benchmark
+
+Generates reproducible, synthetic YouTube-style captions and times each stage
+of dedupe.py on them: read, parse, clean, dedupe and format, plus a streaming
+end-to-end run whose peak RSS is recorded. Every size runs in a fresh
+interpreter so memory figures don't bleed into each other.
+
+Results are written as JSON; pass an earlier result file with --compare to
+flag stages that got slower than --threshold.
+
+Usage:
+    python bench_dedupe.py --output bench.json
+    python bench_dedupe.py --sizes 1,10 --compare baseline.json --threshold 0.15
+    python bench_dedupe.py --generate-only --keep ./corpus
+"""
+
+import io
+import os
+import sys
+import json
+import time
+import random
+import platform
+import argparse
+import resource
+import tempfile
+import multiprocessing
+from datetime import datetime, timezone
+from pathlib import Path
+
+import dedupe
+
+
+DEFAULT_SIZES = [1, 10, 24]
+
+WORDS = (
+    "the of and to a in is it you that he was for on are with as I his they be "
+    "at one have this from or had by word but what some we can out other were "
+    "all there when up use your how said an each she which do their time if "
+    "will way about many then them write would like so these her long make "
+    "thing see him two has look more day could go come did number sound no most "
+    "people my over know water than call first who may down side been now find "
+    "gonna yeah okay right actually really stream chat thanks everyone"
+).split()
+
+# Decorations real auto-captions carry, inserted now and then
+ENTITIES = ['&amp;', '&#39;s', '&gt;&gt;', '&quot;ok&quot;', '&nbsp;']
+FONT_OPEN = '<font color="#E5E5E5">'
+FONT_CLOSE = '</font>'
+
+
+def _ts(ms: int, separator: str = '.') -> str:
+    return dedupe.format_timestamp(ms, separator)
+
+
+def _caption_line(rng: random.Random) -> list[str]:
+    words = [rng.choice(WORDS) for _ in range(rng.randint(5, 10))]
+    if rng.random() < 0.1:
+        words[rng.randrange(len(words))] = rng.choice(ENTITIES)
+    if rng.random() < 0.05:
+        words[0] = FONT_OPEN + words[0]
+        words[-1] += FONT_CLOSE
+    return words
+
+
+def generate_vtt(out, hours: float, seed: int = 0):
+    """
+    Write YouTube auto-caption style VTT: each line builds up word by word
+    with inline ``<c>`` timing tags, under the previous line (rolling
+    two-line cues), followed by a 10ms cue holding the finished line.
+    """
+    rng = random.Random(seed)
+    out.write("WEBVTT\nKind: captions\nLanguage: en\n\n")
+    t = 0
+    previous = ' '
+    limit = int(hours * 3600 * 1000)
+    while t < limit:
+        line = _caption_line(rng)
+        step = rng.randint(2, 4)
+        for i in range(step, len(line) + step, step):
+            shown = line[:i]
+            inline = []
+            for n, word in enumerate(shown):
+                stamp = _ts(t + 150 * n)
+                inline.append(word if n == 0 else f"<{stamp}><c> {word}</c>")
+            out.write(f"{_ts(t)} --> {_ts(t + 2000)} align:start position:0%\n"
+                      f"{previous}\n{''.join(inline)}\n\n")
+            t += rng.randint(300, 900)
+        finished = ' '.join(line)
+        out.write(f"{_ts(t)} --> {_ts(t + 10)} align:start position:0%\n"
+                  f"{previous}\n{finished}\n\n")
+        t += 10
+        previous = finished
+
+
+def generate_srt(out, hours: float, seed: int = 0):
+    """Write progressive (non-rolling) SRT captions, the other common shape."""
+    rng = random.Random(seed)
+    t = 0
+    index = 1
+    limit = int(hours * 3600 * 1000)
+    while t < limit:
+        line = _caption_line(rng)
+        for i in range(3, len(line) + 3, 3):
+            duration = rng.randint(400, 1200)
+            out.write(f"{index}\n{_ts(t, ',')} --> {_ts(t + duration, ',')}\n"
+                      f"{' '.join(line[:i])}\n\n")
+            index += 1
+            t += duration
+
+
+GENERATORS = {'vtt': generate_vtt, 'srt': generate_srt}
+
+
+def generate_corpus(directory: Path, sizes: list[float], seed: int = 0) -> list[Path]:
+    """Write one VTT and one SRT file per size (in hours) into ``directory``."""
+    directory.mkdir(parents=True, exist_ok=True)
+    paths = []
+    for hours in sizes:
+        for fmt, generate in GENERATORS.items():
+            path = directory / f"synthetic-{hours:g}h.{fmt}"
+            if not path.exists():
+                with open(path, 'w', encoding='utf-8') as f:
+                    generate(f, hours, seed)
+            paths.append(path)
+    return paths
+
+
+def _timed(fn, repeat: int):
+    """Run ``fn`` ``repeat`` times; return (best seconds, last result)."""
+    best = float('inf')
+    result = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = fn()
+        best = min(best, time.perf_counter() - start)
+    return best, result
+
+
+def bench_file(path: Path, repeat: int) -> dict:
+    """Benchmark one caption file; runs inside a fresh interpreter."""
+    # Streaming end-to-end first, so peak RSS reflects the real pipeline
+    # rather than the materialized per-stage lists below
+    with open(os.devnull, 'w') as devnull:
+        start = time.perf_counter()
+        stats = dedupe.dedupe_path(path, devnull)
+        end_to_end = time.perf_counter() - start
+    peak_rss_kb = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    if sys.platform == 'darwin':
+        peak_rss_kb //= 1024
+
+    stages = {'end_to_end': end_to_end}
+    stages['read'], content = _timed(lambda: path.read_text(encoding='utf-8'), repeat)
+
+    def parse():
+        parser = dedupe.CueParser(clean=lambda text: text)
+        return parser.feed(content) + parser.close()
+
+    stages['parse'], raw = _timed(parse, repeat)
+    stages['clean'], texts = _timed(
+        lambda: dedupe.clean_lines([text for _, _, text in raw]), repeat)
+    cues = [(s, e, text) for (s, e, _), text in zip(raw, texts) if text]
+    for merge in dedupe.MERGE_ENGINES:
+        key = 'dedupe' if merge == dedupe.DEFAULT_MERGE else f'dedupe_{merge}'
+        stages[key], segments = _timed(
+            lambda: list(dedupe.dedupe_segments(iter(cues), dedupe.Counter(), merge=merge)),
+            repeat)
+        if merge == dedupe.DEFAULT_MERGE:
+            kept = segments
+    for fmt in dedupe.OUTPUT_FORMATS:
+        stages[f'format_{fmt}'], _ = _timed(
+            lambda: dedupe.write_output(kept, io.StringIO(), True, fmt), repeat)
+
+    return {
+        'bytes': path.stat().st_size,
+        'cues': stats['original'],
+        'kept': stats['kept'],
+        'peak_rss_kb': peak_rss_kb,
+        'seconds': {stage: round(value, 6) for stage, value in stages.items()},
+    }
+
+
+def run_benchmarks(paths: list[Path], repeat: int) -> dict:
+    """Benchmark every file, each in its own spawned interpreter."""
+    results = {}
+    context = multiprocessing.get_context('spawn')
+    for path in paths:
+        print(f"  {path.name} ...", file=sys.stderr, flush=True)
+        with context.Pool(1, maxtasksperchild=1) as pool:
+            results[path.name] = pool.apply(bench_file, (path, repeat))
+    return results
+
+
+def compare(results: dict, baseline: dict, threshold: float) -> list[str]:
+    """List stages that are more than ``threshold`` slower than ``baseline``."""
+    regressions = []
+    for name, result in results.items():
+        before = baseline.get('results', {}).get(name)
+        if not before:
+            continue
+        for stage, seconds in result['seconds'].items():
+            old = before['seconds'].get(stage)
+            # Ignore stages too quick to time reliably
+            if not old or max(old, seconds) < 0.01:
+                continue
+            change = seconds / old - 1
+            if change > threshold:
+                regressions.append(f"{name} {stage}: {old:.3f}s -> {seconds:.3f}s "
+                                   f"(+{100 * change:.0f}%)")
+    return regressions
+
+
+def print_table(results: dict):
+    """Print a human-readable summary to stderr."""
+    for name, result in results.items():
+        seconds = result['seconds']
+        cues_per_s = result['cues'] / max(seconds['end_to_end'], 1e-9)
+        print(f"\n{name}: {result['bytes'] / 1e6:.1f} MB, {result['cues']} cues -> "
+              f"{result['kept']} lines, peak RSS {result['peak_rss_kb'] / 1024:.1f} MB, "
+              f"{cues_per_s:,.0f} cues/s end to end", file=sys.stderr)
+        for stage, value in seconds.items():
+            print(f"  {stage:<16} {value:8.3f}s", file=sys.stderr)
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description='Benchmark dedupe.py on synthetic YouTube-style captions'
+    )
+    parser.add_argument('--sizes', default=','.join(map(str, DEFAULT_SIZES)),
+                        help='Comma-separated caption lengths in hours '
+                             '(default: %(default)s)')
+    parser.add_argument('--seed', type=int, default=0,
+                        help='Generator seed (default: 0)')
+    parser.add_argument('--repeat', type=int, default=3,
+                        help='Runs per stage; the best is kept (default: 3)')
+    parser.add_argument('--keep', type=Path, metavar='DIR',
+                        help='Generate the corpus into DIR and keep it '
+                             '(reused by later runs)')
+    parser.add_argument('--generate-only', action='store_true',
+                        help='Only write the corpus (requires --keep)')
+    parser.add_argument('--output', '-o', type=Path,
+                        help='Write results JSON here (default: stdout)')
+    parser.add_argument('--compare', type=Path, metavar='BASELINE',
+                        help='Earlier results JSON to compare against')
+    parser.add_argument('--threshold', type=float, default=0.15,
+                        help='Allowed slowdown per stage for --compare, as a '
+                             'fraction (default: %(default)s)')
+
+    args = parser.parse_args()
+    if args.generate_only and not args.keep:
+        parser.error('--generate-only needs --keep DIR')
+    sizes = [float(size) for size in args.sizes.split(',')]
+
+    with tempfile.TemporaryDirectory() as tmp:
+        corpus = args.keep or Path(tmp)
+        print(f"Generating corpus in {corpus} ...", file=sys.stderr, flush=True)
+        paths = generate_corpus(corpus, sizes, args.seed)
+        if args.generate_only:
+            return
+        print("Benchmarking ...", file=sys.stderr, flush=True)
+        results = run_benchmarks(paths, max(1, args.repeat))
+
+    report = {
+        'meta': {
+            'date': datetime.now(timezone.utc).isoformat(timespec='seconds'),
+            'python': platform.python_version(),
+            'platform': platform.platform(),
+            'parser_version': dedupe.PARSER_VERSION,
+            'seed': args.seed,
+            'repeat': args.repeat,
+        },
+        'results': results,
+    }
+    print_table(results)
+
+    output = json.dumps(report, indent=2)
+    if args.output:
+        args.output.write_text(output + '\n')
+    else:
+        print(output)
+
+    if args.compare:
+        regressions = compare(results, json.loads(args.compare.read_text()),
+                              args.threshold)
+        if regressions:
+            print(f"\nSlowdowns beyond {100 * args.threshold:.0f}%:", file=sys.stderr)
+            for line in regressions:
+                print(f"  {line}", file=sys.stderr)
+            sys.exit(1)
+        print(f"\nNo stage slower than {100 * args.threshold:.0f}% "
+              f"against {args.compare}", file=sys.stderr)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,277 @@
+#!/usr/bin/env python3
+"""
+Download Engine Benchmark
+
+Measures what download.py spends per URL on running yt-dlp itself, with
+each engine: one yt-dlp process per extraction and download (subprocess)
+versus YoutubeDL instances reused inside this process (embedded).
+
+The network is taken out of the picture by a local stand-in: an HTTP
+server on 127.0.0.1 serving small media files, which yt-dlp's generic
+extractor handles like any direct video link. What remains is per-URL
+overhead: interpreter start-up, extractor imports, option parsing.
+
+With --throttle N the stand-in instead behaves like a rate-limiting
+site: it answers HTTP 429 to requests beyond N a second and streams
+each clip over --clip-seconds. The run then compares the
+scheduler with and without adaptive per-host limits, by downloads
+completed per hour.
+
+The subprocess engine needs ``yt-dlp`` on PATH, the embedded one the
+yt_dlp module; an engine that isn't available is skipped.
+
+Usage:
+    python bench_download.py
+    python bench_download.py --urls 50 --jobs 4 --output bench.json
+    python bench_download.py --throttle 3 --jobs 8 --urls 24
+"""
+
+import argparse
+import contextlib
+import io
+import json
+import os
+import platform
+import sys
+import tempfile
+import threading
+import time
+from collections import deque
+from datetime import datetime, timezone
+from functools import partial
+from http.server import SimpleHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+
+import download
+
+
+DEFAULT_URLS = 20
+CLIP_BYTES = 64 * 1024
+
+
+class _QuietHandler(SimpleHTTPRequestHandler):
+    def log_message(self, *args):
+        pass
+
+
+class _ThrottlingHandler(_QuietHandler):
+    """Answers 429 past ``per_second`` requests a second; streams clips slowly."""
+
+    per_second = 0
+    clip_seconds = 0.0
+    _served = deque()
+    _lock = threading.Lock()
+
+    def do_GET(self):
+        cls = type(self)
+        with cls._lock:
+            now = time.monotonic()
+            while cls._served and cls._served[0] <= now - 1:
+                cls._served.popleft()
+            refused = len(cls._served) >= cls.per_second
+            if not refused:
+                cls._served.append(now)
+        if refused:
+            self.send_error(429, "Too Many Requests")
+            return
+        try:
+            path = Path(self.translate_path(self.path))
+            if not path.is_file():
+                self.send_error(404)
+                return
+            data = path.read_bytes()
+            self.send_response(200)
+            self.send_header("Content-Type", "video/mp4")
+            self.send_header("Content-Length", str(len(data)))
+            self.end_headers()
+            chunk = max(1, len(data) // 20)
+            for start in range(0, len(data), chunk):
+                self.wfile.write(data[start:start + chunk])
+                time.sleep(cls.clip_seconds / 20)
+        except (BrokenPipeError, ConnectionResetError):
+            pass
+
+
+@contextlib.contextmanager
+def stand_in_server(directory: Path, count: int, throttle: int = 0,
+                    clip_seconds: float = 0.0):
+    """
+    Serve ``count`` small clips from ``directory``; yields their URLs.
+    With ``throttle``, at most that many requests are served a second.
+    """
+    clip = os.urandom(CLIP_BYTES)
+    for n in range(1, count + 1):
+        (directory / f"clip-{n}.mp4").write_bytes(clip)
+    handler = _QuietHandler
+    if throttle:
+        handler = type("Handler", (_ThrottlingHandler,),
+                       {"per_second": throttle, "clip_seconds": clip_seconds,
+                        "_served": deque()})
+    server = ThreadingHTTPServer(("127.0.0.1", 0),
+                                 partial(handler, directory=str(directory)))
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    try:
+        port = server.server_address[1]
+        yield [f"http://127.0.0.1:{port}/clip-{n}.mp4" for n in range(1, count + 1)]
+    finally:
+        server.shutdown()
+        server.server_close()
+
+
+def download_args(output: Path) -> argparse.Namespace:
+    """The arguments download.py gets for a plain ``-o output`` run."""
+    return argparse.Namespace(
+        audio=None, quality=None, format=None, output=str(output), name=None,
+        range=None, playlist=False, channel=False, archive=None, subs=None,
+        thumb=False, meta=False, proxy=None, pipeline=False,
+        subs_only=False, auto_subs=False)
+
+
+def bench_engine(name: str, urls: list, output: Path, jobs: int) -> dict:
+    """Download every URL with one engine, as download.py would."""
+    engine = download.make_engine(name)
+    cmd = download.build_command(download_args(output))
+    log = io.StringIO()
+    try:
+        start = time.perf_counter()
+        with contextlib.redirect_stdout(log):
+            # The first URL on its own, to separate start-up from steady state
+            first_ok, _, _ = download.run_downloads(urls[:1], cmd, engine=engine)
+            first = time.perf_counter() - start
+            success, _, _ = download.run_downloads(urls[1:], cmd, jobs, engine=engine)
+        total = time.perf_counter() - start
+    finally:
+        engine.close()
+    rest = max(len(urls) - 1, 1)
+    return {
+        "urls": len(urls),
+        "success": first_ok + success,
+        "failed": len(urls) - first_ok - success,
+        "seconds": round(total, 4),
+        "first_url_seconds": round(first, 4),
+        "per_url_ms": round(1000 * total / len(urls), 1),
+        "steady_per_url_ms": round(1000 * (total - first) / rest, 1),
+    }
+
+
+def bench_scheduler(name: str, urls: list, output: Path, jobs: int,
+                    adaptive: bool) -> dict:
+    """Download every URL from a throttling host, with or without adaptive limits."""
+    engine = download.make_engine(name)
+    cmd = download.build_command(download_args(output))
+    log = io.StringIO()
+    try:
+        start = time.perf_counter()
+        with contextlib.redirect_stdout(log):
+            success, failed, results = download.run_downloads(
+                urls, cmd, jobs, prefetch=False, engine=engine,
+                retries=download.DEFAULT_RETRIES, adaptive=adaptive)
+        total = time.perf_counter() - start
+    finally:
+        engine.close()
+    return {
+        "urls": len(urls),
+        "success": success,
+        "failed": failed,
+        "throttled": sum(result["throttled"] > 0 for result in results),
+        "seconds": round(total, 2),
+        "completed_per_hour": round(3600 * success / total),
+    }
+
+
+def available_engines() -> list:
+    engines = []
+    try:
+        download.EmbeddedEngine().close()
+        engines.append("embedded")
+    except ImportError:
+        print("Skipping embedded: the yt_dlp module isn't installed", file=sys.stderr)
+    if download.shutil.which("yt-dlp"):
+        engines.append("subprocess")
+    else:
+        print("Skipping subprocess: yt-dlp isn't on PATH", file=sys.stderr)
+    return engines
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Compare per-URL overhead of download.py's yt-dlp engines"
+    )
+    parser.add_argument("--urls", "-n", type=int, default=DEFAULT_URLS,
+                        help=f"URLs to download per engine (default: {DEFAULT_URLS})")
+    parser.add_argument("--jobs", "-j", type=int, default=1,
+                        help="Concurrent downloads (default: 1)")
+    parser.add_argument("--engines", default="embedded,subprocess",
+                        help="Comma-separated engines to run (default: %(default)s)")
+    parser.add_argument("--throttle", type=int, metavar="N", default=0,
+                        help="Make the stand-in answer 429 past N requests a second "
+                             "and compare adaptive against fixed scheduling")
+    parser.add_argument("--clip-seconds", type=float, default=2.0,
+                        help="With --throttle, how long serving a clip takes "
+                             "(default: %(default)s)")
+    parser.add_argument("--output", "-o", type=Path,
+                        help="Write results JSON here (default: stdout)")
+
+    args = parser.parse_args()
+    wanted = args.engines.split(",")
+    engines = [name for name in available_engines() if name in wanted]
+    if not engines:
+        print("Error: no engine to benchmark", file=sys.stderr)
+        sys.exit(1)
+
+    results = {}
+    with tempfile.TemporaryDirectory() as tmp:
+        served = Path(tmp) / "served"
+        served.mkdir()
+        with stand_in_server(served, max(1, args.urls), args.throttle,
+                             args.clip_seconds) as urls:
+            if args.throttle:
+                for mode in ("fixed", "adaptive"):
+                    print(f"  {engines[0]}, {mode} ...", file=sys.stderr, flush=True)
+                    results[mode] = bench_scheduler(engines[0], urls, Path(tmp) / mode,
+                                                    max(1, args.jobs), mode == "adaptive")
+            else:
+                for name in engines:
+                    print(f"  {name} ...", file=sys.stderr, flush=True)
+                    results[name] = bench_engine(name, urls, Path(tmp) / name,
+                                                 max(1, args.jobs))
+
+    if args.throttle:
+        for mode, result in results.items():
+            print(f"\n{mode}: {result['success']}/{result['urls']} downloaded in "
+                  f"{result['seconds']:.1f}s, {result['throttled']} throttled, "
+                  f"{result['completed_per_hour']} completed/hour", file=sys.stderr)
+    else:
+        for name, result in results.items():
+            print(f"\n{name}: {result['success']}/{result['urls']} downloaded in "
+                  f"{result['seconds']:.2f}s", file=sys.stderr)
+            print(f"  first URL      {1000 * result['first_url_seconds']:8.1f} ms",
+                  file=sys.stderr)
+            print(f"  per URL after  {result['steady_per_url_ms']:8.1f} ms",
+                  file=sys.stderr)
+    if not args.throttle and len(results) == 2:
+        ratio = results["subprocess"]["seconds"] / max(results["embedded"]["seconds"], 1e-9)
+        print(f"\nembedded is {ratio:.1f}x faster end to end", file=sys.stderr)
+
+    report = {
+        "meta": {
+            "date": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "jobs": args.jobs,
+            "throttle": args.throttle,
+        },
+        "results": results,
+    }
+    output = json.dumps(report, indent=2)
+    if args.output:
+        args.output.write_text(output + "\n")
+    else:
+        print(output)
+    if not args.throttle and any(result["failed"] for result in results.values()):
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -6,17 +6,104 @@ Removes progressive caption artifacts from auto-generated YouTube subtitles.
 Auto-generated captions often repeat text as it builds up character by character,
 resulting in many duplicate or near-duplicate lines.
 
+The pipeline is streaming: cues are parsed from fixed-size chunks of the input,
+deduplicated lazily and written as they are produced, so memory stays flat no
+matter how long the caption file is.
+
 Usage:
     python dedupe.py input.vtt > output.txt
     python dedupe.py input.vtt --timestamps > output.txt
     python dedupe.py input.vtt --format=srt > output.srt
+    python dedupe.py captions/ 'more/**/*.vtt' --output-dir=clean/ --jobs=8 --stats
+    python dedupe.py input.vtt --format=jsonl --index=out.jsonl.idx > out.jsonl
+    echo '{"id": 1, "input": "input.vtt"}' | python dedupe.py --serve
+
+As a library:
+    from dedupe import dedupe_captions
+    text, stats = dedupe_captions(vtt_bytes, include_timestamps=True)
 """
 
+import io
+import os
 import re
 import sys
+import glob
+import time
+import zlib
+import json
+import codecs
+import ctypes
+import ctypes.util
+import select
+import struct
+import hashlib
 import argparse
+from array import array
+from collections import Counter, OrderedDict, deque
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import ExitStack
 from html import unescape
+from itertools import repeat
 from pathlib import Path
+from random import Random
+from typing import Optional
+
+
+# Characters read from the input per parser step
+CHUNK_SIZE = 64 * 1024
+
+OUTPUT_FORMATS = ['txt', 'srt', 'vtt', 'jsonl']
+
+# Suffixes picked up when a directory is given as input
+CAPTION_SUFFIXES = {'.vtt', '.srt'}
+
+# Merged segments are emitted at a sentence end or once they reach this
+# many words, whichever comes first
+MAX_SEGMENT_WORDS = 40
+SENTENCE_ENDINGS = ('.', '?', '!')
+
+# Lines remembered by the windowed seen-store (--seen=window)
+DEFAULT_SEEN_WINDOW = 1000
+
+# Near-duplicate detection (--fuzzy): MinHash signature length, the chance
+# a pair right at the threshold is looked at, and how far back in seconds
+# a line can be to count as repeated
+MINHASH_PERMUTATIONS = 32
+LSH_RECALL = 0.99
+DEFAULT_FUZZY_WINDOW = 60.0
+
+# Live tail mode (--follow): longest wait between checks for new data
+DEFAULT_POLL_INTERVAL = 1.0
+INOTIFY_EVENTS = 0x002 | 0x008 | 0x400 | 0x800   # modify, close_write, delete/move self
+
+# Seek index written next to jsonl transcripts
+INDEX_SUFFIX = '.idx'
+INDEX_MAGIC = b'HGIX'
+INDEX_HEADER = struct.Struct('<4sQ')
+
+# Result cache (--cache-dir). Bump PARSER_VERSION whenever parsing or
+# deduplication would produce different segments for the same input.
+PARSER_VERSION = 2
+DEFAULT_CACHE_SIZE = 256 * 1024 * 1024
+CACHE_SUFFIX = '.seg'
+CACHE_MAGIC = b'HGSC'
+CACHE_RECORD = struct.Struct('<qqI')
+CACHE_FOOTER = struct.Struct('<I4s')
+
+TIMING_PATTERN = re.compile(
+    r'((?:\d+:)?\d{2}:\d{2}[.,]\d{3})\s*-->\s*((?:\d+:)?\d{2}:\d{2}[.,]\d{3})'
+)
+
+# A whole cue in one match: the first timing on a line (the same match
+# TIMING_PATTERN.search would find), then every following non-blank line
+CUE_PATTERN = re.compile(
+    r'^[^\n]*?((?:\d+:)?\d{2}:\d{2}[.,]\d{3})[^\S\n]*-->'
+    r'[^\S\n]*((?:\d+:)?\d{2}:\d{2}[.,]\d{3})[^\n]*\n?'
+    r'((?:[^\n]*\S[^\n]*(?:\n|\Z))*)',
+    re.M
+)
+# Tags never reach past the NUL that separates texts in clean_lines
+TAG_PATTERN = re.compile(r'<[^>\0]+>')
 
 
 def clean_line(line: str) -> str:
@@ -30,159 +117,1388 @@ def clean_line(line: str) -> str:
     return line.strip()
 
 
-def parse_vtt_timestamp(timestamp: str) -> str:
-    """Convert VTT timestamp to simple HH:MM:SS format."""
-    match = re.match(r'(\d{2}):(\d{2}):(\d{2})[.,]\d{3}', timestamp)
-    if match:
-        return f"{match.group(1)}:{match.group(2)}:{match.group(3)}"
-    # Handle MM:SS format
-    match = re.match(r'(\d{2}):(\d{2})[.,]\d{3}', timestamp)
-    if match:
-        return f"00:{match.group(1)}:{match.group(2)}"
-    return timestamp
+def clean_lines(texts: list[str]) -> list[str]:
+    """
+    Clean many texts at once, exactly as clean_line would one by one.
 
+    The texts are joined with NUL so tags and entities are handled by a
+    single pass over the batch; only the whitespace collapse is per text.
+    """
+    joined = '\0'.join(texts)
+    if joined.count('\0') != len(texts) - 1:
+        return [clean_line(text) for text in texts]
+    joined = TAG_PATTERN.sub('', joined)
+    if '&' in joined:
+        joined = unescape(joined)
+    return [' '.join(text.split()) for text in joined.split('\0')]
 
-def parse_vtt(content: str) -> list[tuple[str, str]]:
-    """Parse VTT content into (timestamp, text) pairs."""
-    # Remove WEBVTT header and metadata
-    content = re.sub(r'WEBVTT\n.*?\n\n', '', content, flags=re.DOTALL)
-    content = re.sub(r'Kind:.*\n', '', content)
-    content = re.sub(r'Language:.*\n', '', content)
 
-    segments = []
-    # Match timestamp lines and following text
-    pattern = r'(\d{2}:\d{2}[:\d{2}]?[.,]\d{3})\s*-->\s*(\d{2}:\d{2}[:\d{2}]?[.,]\d{3})\n(.+?)(?=\n\n|\n\d{2}:\d{2}|\Z)'
+def timestamp_to_ms(timestamp: str) -> int:
+    """Convert a VTT/SRT timestamp ([HH:]MM:SS.mmm or ,mmm) to milliseconds."""
+    clock, _, millis = timestamp.replace(',', '.').partition('.')
+    seconds = 0
+    for part in clock.split(':'):
+        seconds = seconds * 60 + int(part)
+    return seconds * 1000 + int(millis or 0)
 
-    for match in re.finditer(pattern, content, re.DOTALL):
-        start_time = parse_vtt_timestamp(match.group(1))
-        text = clean_line(match.group(3))
-        if text:
-            segments.append((start_time, text))
 
-    return segments
+def timestamps_to_ms(timestamps) -> list[int]:
+    """Convert many timestamps at once; same results as timestamp_to_ms."""
+    digits = ' '.join(timestamps).replace(':', '').replace('.', '').replace(',', '')
+    # Each value reads HMMSSmmm in decimal; take out the excess of 100 over 60
+    return [value - value // 10000000 * 6400000 - value // 100000 % 100 * 40000
+            for value in map(int, digits.split())]
 
 
-def parse_srt(content: str) -> list[tuple[str, str]]:
-    """Parse SRT content into (timestamp, text) pairs."""
-    segments = []
-    # SRT format: index\ntimestamp --> timestamp\ntext\n\n
-    pattern = r'\d+\n(\d{2}:\d{2}:\d{2}),\d{3}\s*-->\s*\d{2}:\d{2}:\d{2},\d{3}\n(.+?)(?=\n\n|\Z)'
+def format_clock(ms: int) -> str:
+    """Format milliseconds as HH:MM:SS."""
+    minutes, seconds = divmod(ms // 1000, 60)
+    hours, minutes = divmod(minutes, 60)
+    return f"{hours:02d}:{minutes:02d}:{seconds:02d}"
 
-    for match in re.finditer(pattern, content, re.DOTALL):
-        timestamp = match.group(1)
-        text = clean_line(match.group(2))
-        if text:
-            segments.append((timestamp, text))
 
-    return segments
+def format_timestamp(ms: int, separator: str = '.') -> str:
+    """Format milliseconds as a VTT (HH:MM:SS.mmm) or SRT (``,``) timestamp."""
+    return f"{format_clock(ms)}{separator}{ms % 1000:03d}"
 
 
-def deduplicate(segments: list[tuple[str, str]]) -> list[tuple[str, str]]:
-    """Remove duplicate text while preserving order and timestamps."""
-    seen = set()
-    result = []
+class SegmentStore:
+    """
+    Compact, list-like container of (start_ms, end_ms, text) segments.
+
+    Times live in parallel ``array('q')`` columns and texts in a plain list,
+    so a materialized transcript costs two machine integers per cue rather
+    than a tuple and timestamp string objects per cue.
+    """
+
+    __slots__ = ('starts', 'ends', 'texts')
+
+    def __init__(self, segments=()):
+        self.starts = array('q')
+        self.ends = array('q')
+        self.texts = []
+        for segment in segments:
+            self.append(segment)
+
+    def append(self, segment: tuple[int, int, str]):
+        start, end, text = segment
+        self.starts.append(start)
+        self.ends.append(end)
+        self.texts.append(text)
+
+    def __len__(self) -> int:
+        return len(self.texts)
+
+    def __getitem__(self, i: int) -> tuple[int, int, str]:
+        return self.starts[i], self.ends[i], self.texts[i]
+
+    def __iter__(self):
+        return zip(self.starts, self.ends, self.texts)
+
+    def __eq__(self, other) -> bool:
+        return list(self) == list(other)
+
+
+class CueParser:
+    """
+    Incremental VTT/SRT cue parser.
+
+    Text is fed in arbitrary chunks. Everything up to the last blank line is
+    lexed in one go: CUE_PATTERN picks out each cue (timing line plus text
+    lines) in a single scan, and the batch of texts is cleaned together, so
+    there is no per-line Python work. The rest is carried over to the next
+    call. Header lines, cue identifiers, SRT indices and NOTE blocks carry no
+    timing line and are skipped.
+
+    ``clean`` takes the list of raw cue texts (line breaks included) and
+    returns them cleaned; cues that clean to nothing are dropped.
+    """
+
+    def __init__(self, clean=clean_lines):
+        self.clean = clean
+        self._pending = []
+        self._start = None
+        self._end = None
+        self._text = []
+
+    def feed(self, chunk: str) -> list[tuple[int, int, str]]:
+        """Consume a chunk of text and return the cues it completed."""
+        # Only the new chunk (plus the two characters before it) can hold a
+        # blank line we haven't seen, so pending text is never rescanned
+        tail = self._pending[-1][-2:] if self._pending else ''
+        window = tail + chunk
+        lf = window.rfind('\n\n')
+        crlf = window.rfind('\n\r\n')
+        cut = max(lf + 2 if lf >= 0 else 0, crlf + 3 if crlf >= 0 else 0) - len(tail)
+        if cut <= 0:
+            self._pending.append(chunk)
+            return []
+        self._pending.append(chunk[:cut])
+        block = ''.join(self._pending)
+        self._pending = [chunk[cut:]]
+        return self._lex(block)
+
+    def close(self) -> list[tuple[int, int, str]]:
+        """Flush the final cue once the input is exhausted."""
+        block = ''.join(self._pending)
+        self._pending = []
+        return self._lex(block)
+
+    def _lex(self, block: str) -> list[tuple[int, int, str]]:
+        cues = CUE_PATTERN.findall(block)
+        # Every cue's timing line holds an arrow, so any extra one may be a
+        # timing line inside cue text, which starts another cue; leave those
+        # rare blocks to the line-by-line path
+        if block.count('-->') != len(cues) and any('-->' in text for *_, text in cues):
+            return self._lex_lines(block)
+        if not cues:
+            return []
+        starts, ends, texts = zip(*cues)
+        return [cue for cue in zip(timestamps_to_ms(starts), timestamps_to_ms(ends),
+                                   self.clean(list(texts))) if cue[2]]
+
+    def _lex_lines(self, block: str) -> list[tuple[int, int, str]]:
+        starts, ends, texts = [], [], []
+        for line in block.split('\n'):
+            self._line(line.rstrip('\r'), starts, ends, texts)
+        self._flush(starts, ends, texts)
+        return [cue for cue in zip(starts, ends, self.clean(texts)) if cue[2]]
+
+    def _line(self, line: str, starts: list, ends: list, texts: list):
+        if '-->' in line:
+            match = TIMING_PATTERN.search(line)
+            if match:
+                self._flush(starts, ends, texts)
+                self._start = timestamp_to_ms(match.group(1))
+                self._end = timestamp_to_ms(match.group(2))
+                return
+        if not line.strip():
+            self._flush(starts, ends, texts)
+        elif self._start is not None:
+            self._text.append(line)
+
+    def _flush(self, starts: list, ends: list, texts: list):
+        if self._start is not None:
+            starts.append(self._start)
+            ends.append(self._end)
+            texts.append('\n'.join(self._text))
+        self._start = None
+        self._text = []
+
+
+def parse_chunks(chunks):
+    """Lazily yield (start_ms, end_ms, text) cues from an iterable of text chunks."""
+    parser = CueParser()
+    for chunk in chunks:
+        yield from parser.feed(chunk)
+    yield from parser.close()
+
+
+def iter_cues(stream, chunk_size: int = CHUNK_SIZE):
+    """Lazily yield (start_ms, end_ms, text) cues from a VTT/SRT text stream."""
+    return parse_chunks(iter(lambda: stream.read(chunk_size), ''))
+
+
+def caption_chunks(source, chunk_size: int = CHUNK_SIZE):
+    """
+    Yield text chunks from caption ``source``: bytes, a str, or a text or
+    binary file object. Bytes are decoded as UTF-8 incrementally, so a
+    character split across reads is never mangled.
+    """
+    if isinstance(source, str):
+        yield source
+        return
+    if isinstance(source, (bytes, bytearray, memoryview)):
+        source = io.BytesIO(source)
+    decoder = codecs.getincrementaldecoder('utf-8')()
+    for chunk in iter(lambda: source.read(chunk_size), source.read(0)):
+        yield decoder.decode(chunk) if isinstance(chunk, bytes) else chunk
+    tail = decoder.decode(b'', final=True)
+    if tail:
+        yield tail
+
+
+class FileWatcher:
+    """
+    Block until a file is modified, using inotify where available.
+
+    inotify is reached through ctypes so there is nothing to install; on
+    other platforms, or if the watch cannot be set up, ``wait`` simply
+    sleeps, which turns the caller into a poller.
+    """
+
+    def __init__(self, path: Path):
+        self._fd = None
+        try:
+            libc = ctypes.CDLL(ctypes.util.find_library('c'), use_errno=True)
+            fd = libc.inotify_init1(os.O_NONBLOCK | os.O_CLOEXEC)
+        except (OSError, AttributeError, TypeError):
+            return
+        if fd < 0:
+            return
+        if libc.inotify_add_watch(fd, os.fsencode(path), INOTIFY_EVENTS) < 0:
+            os.close(fd)
+            return
+        self._fd = fd
+
+    def wait(self, timeout: float):
+        """Return after the next change, or after ``timeout`` seconds."""
+        if self._fd is None:
+            time.sleep(timeout)
+            return
+        if select.select([self._fd], [], [], timeout)[0]:
+            try:
+                # Drain queued events; the caller just re-reads the file
+                while os.read(self._fd, 4096):
+                    pass
+            except BlockingIOError:
+                pass
+
+    def close(self):
+        if self._fd is not None:
+            os.close(self._fd)
+            self._fd = None
+
+
+def follow_chunks(path: Path, poll_interval: float = DEFAULT_POLL_INTERVAL,
+                  idle_timeout: Optional[float] = None,
+                  chunk_size: int = CHUNK_SIZE):
+    """
+    Yield text as it is appended to ``path``, like ``tail -f`` from the top.
+
+    Bytes are decoded incrementally so a UTF-8 sequence split across two
+    writes is not mangled. Stops once the file has not grown for
+    ``idle_timeout`` seconds (if given) or on Ctrl-C, so callers can flush.
+    """
+    decoder = codecs.getincrementaldecoder('utf-8')(errors='replace')
+    waited = 0.0
+    try:
+        while not path.exists():
+            if idle_timeout is not None and waited >= idle_timeout:
+                return
+            time.sleep(poll_interval)
+            waited += poll_interval
+
+        watcher = FileWatcher(path)
+        try:
+            with open(path, 'rb') as f:
+                last_growth = time.monotonic()
+                while True:
+                    data = f.read(chunk_size)
+                    if data:
+                        last_growth = time.monotonic()
+                        text = decoder.decode(data)
+                        if text:
+                            yield text
+                        continue
+                    if f.tell() > os.fstat(f.fileno()).st_size:
+                        # Truncated and rewritten: start over, the dedup
+                        # state suppresses what was already emitted
+                        f.seek(0)
+                        decoder.reset()
+                        continue
+                    if idle_timeout is not None and \
+                            time.monotonic() - last_growth >= idle_timeout:
+                        break
+                    watcher.wait(poll_interval)
+        finally:
+            watcher.close()
+    except KeyboardInterrupt:
+        pass
+
+    tail = decoder.decode(b'', final=True)
+    if tail:
+        yield tail
+
 
-    for timestamp, text in segments:
+def parse_vtt(content: str) -> SegmentStore:
+    """Parse VTT content into (start_ms, end_ms, text) segments."""
+    return SegmentStore(iter_cues(io.StringIO(content)))
+
+
+def parse_srt(content: str) -> SegmentStore:
+    """Parse SRT content into (start_ms, end_ms, text) segments."""
+    return SegmentStore(iter_cues(io.StringIO(content)))
+
+
+class WindowSeenStore:
+    """
+    Seen-set that only remembers the ``size`` most recently used lines.
+
+    Repeats further back than the window are no longer caught, which is
+    rarely a loss for captions and keeps memory fixed on endless streams.
+    """
+
+    def __init__(self, size: int = DEFAULT_SEEN_WINDOW):
+        self.size = size
+        self._keys = OrderedDict()
+
+    def __contains__(self, key: str) -> bool:
+        if key in self._keys:
+            self._keys.move_to_end(key)
+            return True
+        return False
+
+    def __len__(self) -> int:
+        return len(self._keys)
+
+    def add(self, key: str):
+        self._keys[key] = None
+        self._keys.move_to_end(key)
+        if len(self._keys) > self.size:
+            self._keys.popitem(last=False)
+
+    def discard(self, key: str):
+        self._keys.pop(key, None)
+
+
+class FingerprintSeenStore:
+    """
+    Seen-set holding 64-bit hash fingerprints instead of the lines.
+
+    Fingerprints live in an ``array('Q')`` open-addressing table with linear
+    probing (0 marks an empty slot). The table doubles once it is half full,
+    so each entry costs 16-32 bytes however long the line is. A false positive needs a 64-bit hash
+    collision between two distinct lines of the same run.
+    """
+
+    def __init__(self, capacity: int = 1024):
+        self._slots = array('Q', bytes(8 * capacity))
+        self._mask = capacity - 1
+        self._count = 0
+
+    @staticmethod
+    def _fingerprint(key: str) -> int:
+        return (hash(key) & 0xFFFFFFFFFFFFFFFF) or 1
+
+    def _find(self, fingerprint: int) -> int:
+        """Slot holding ``fingerprint``, or the empty slot ending its probe."""
+        slots, mask = self._slots, self._mask
+        i = fingerprint & mask
+        while slots[i] and slots[i] != fingerprint:
+            i = (i + 1) & mask
+        return i
+
+    def __contains__(self, key: str) -> bool:
+        return bool(self._slots[self._find(self._fingerprint(key))])
+
+    def __len__(self) -> int:
+        return self._count
+
+    def add(self, key: str):
+        fingerprint = self._fingerprint(key)
+        i = self._find(fingerprint)
+        if self._slots[i]:
+            return
+        self._slots[i] = fingerprint
+        self._count += 1
+        if 2 * self._count > len(self._slots):
+            self._grow()
+
+    def discard(self, key: str):
+        slots, mask = self._slots, self._mask
+        i = self._find(self._fingerprint(key))
+        if not slots[i]:
+            return
+        # Backward-shift deletion keeps probe chains intact without tombstones
+        j = i
+        while True:
+            slots[i] = 0
+            while True:
+                j = (j + 1) & mask
+                if not slots[j]:
+                    self._count -= 1
+                    return
+                home = slots[j] & mask
+                # Move slots[j] into the hole unless its home lies in (i, j]
+                if (j > i and (home <= i or home > j)) or \
+                        (j < i and (home <= i and home > j)):
+                    break
+            slots[i] = slots[j]
+            i = j
+
+    def _grow(self):
+        old = self._slots
+        self._slots = array('Q', bytes(16 * len(old)))
+        self._mask = len(self._slots) - 1
+        for fingerprint in old:
+            if fingerprint:
+                self._slots[self._find(fingerprint)] = fingerprint
+
+
+# Seen-set implementations selectable with --seen
+SEEN_STORES = {
+    'exact': lambda window: set(),
+    'window': WindowSeenStore,
+    'hash': lambda window: FingerprintSeenStore(),
+}
+
+
+def make_seen_store(kind: str = 'exact', window: int = DEFAULT_SEEN_WINDOW):
+    """Create the seen-set used by the dedupe engines."""
+    return SEEN_STORES[kind](window)
+
+
+def iter_deduplicate(segments, seen=None, stats: Optional[Counter] = None):
+    """
+    Lazily remove duplicate text while preserving order and timestamps.
+
+    A kept segment can still be replaced by a longer version of itself from
+    the very next cue, so exactly one segment is held back before it is
+    yielded. ``seen`` is any set-like store from ``make_seen_store``; exact
+    repeats it catches are counted under ``stats['exact']``.
+    """
+    seen = set() if seen is None else seen
+    stats = Counter() if stats is None else stats
+    previous = None
+
+    for start, end, text in segments:
         # Normalize for comparison
         normalized = text.lower().strip()
 
         # Skip if we've seen this exact text
         if normalized in seen:
+            stats['exact'] += 1
             continue
 
-        # Skip if this text is a substring of the previous entry
-        # (handles progressive caption buildup)
-        if result and normalized in result[-1][1].lower():
-            continue
+        if previous is not None:
+            previous_normalized = previous[2].lower()
+
+            # Skip if this text is a substring of the previous entry
+            # (handles progressive caption buildup)
+            if normalized in previous_normalized:
+                continue
 
-        # Skip if previous text is a substring of this
-        # (replace with the longer version)
-        if result and result[-1][1].lower() in normalized:
-            seen.discard(result[-1][1].lower().strip())
-            result.pop()
+            # Replace the previous entry if it is a substring of this one,
+            # otherwise it is final and can be released
+            if previous_normalized in normalized:
+                seen.discard(previous_normalized.strip())
+            else:
+                yield previous
 
         seen.add(normalized)
-        result.append((timestamp, text))
+        previous = (start, end, text)
+
+    if previous is not None:
+        yield previous
+
+
+def deduplicate(segments, seen=None,
+                stats: Optional[Counter] = None) -> SegmentStore:
+    """Remove duplicate text while preserving order and timestamps."""
+    return SegmentStore(iter_deduplicate(segments, seen, stats))
+
+
+def prefix_function(tokens: list) -> list:
+    """
+    KMP prefix function of ``tokens``: entry i is the length of the longest
+    proper prefix of ``tokens[:i + 1]`` that is also a suffix of it.
+    """
+    pi = [0] * len(tokens)
+    k = 0
+    for i in range(1, len(tokens)):
+        token = tokens[i]
+        while k and tokens[k] != token:
+            k = pi[k - 1]
+        if tokens[k] == token:
+            k += 1
+        pi[i] = k
+    return pi
+
+
+def find_overlap(window: list, tokens: list) -> int:
+    """
+    Length of the longest prefix of ``tokens`` that ``window`` ends with,
+    both lists of token IDs: the KMP automaton of ``tokens`` run over the
+    end of the window, so linear in their lengths.
+    """
+    if not tokens:
+        return 0
+    pi = prefix_function(tokens)
+    last = len(tokens)
+    k = 0
+    # A prefix ending the window starts in its last len(tokens) tokens
+    for token in window[-last:]:
+        if k == last:
+            k = pi[k - 1]
+        while k and tokens[k] != token:
+            k = pi[k - 1]
+        if tokens[k] == token:
+            k += 1
+    return k
+
 
-    return result
+def intern_tokens(text: str, table: dict) -> list:
+    """Token IDs of the words of ``text``, adding new words to ``table``."""
+    return [table.setdefault(word, len(table)) for word in text.split()]
 
 
-def format_output(segments: list[tuple[str, str]],
+def iter_merge_overlaps(segments, seen=None, stats: Optional[Counter] = None,
+                        max_words: int = MAX_SEGMENT_WORDS):
+    """
+    Stitch progressive and rolling captions into continuous segments.
+
+    Cues that each start with the one before (progressive buildup, or a
+    plain repeat) make up one caption line, and the latest of them stands
+    for it. Any other cue starts a new line, made of its words after the
+    longest run of the previous cue's last words that it starts with
+    (YouTube's rolling two-line cues). A cue the previous one already
+    contains, or that repeats a finished line caught by ``seen`` (counted
+    under ``stats['exact']``), adds nothing.
+
+    The overlap is found by KMP over token IDs, each cue tokenized at most
+    once. Exact string checks settle the cases with a single candidate
+    first (the cue goes on from where the line stands, or its first word
+    occurs once in the previous cue), so a cue costs time linear in its
+    length and the previous one's either way. Words are compared as
+    written, and cue texts are expected whitespace-normalized, as the
+    parser leaves them.
+
+    A segment is emitted after a line that ends a sentence or brings it
+    to ``max_words`` words, and before a line that shares nothing with
+    the one before it.
+    """
+    seen = set() if seen is None else seen
+    stats = Counter() if stats is None else stats
+    segments = iter(segments)
+    for start, end, last in segments:
+        break
+    else:
+        return
+    table = {}          # word -> token ID
+    pieces = []         # lines of the segment being built
+    words = 0           # words in them
+    cut = 0             # where the current line starts in its latest cue, ``last``
+    last_ids = interned = None
+
+    for cue_start, cue_end, text in segments:
+        if text.startswith(last):
+            # The common case, so it does as little as possible
+            last = text
+            end = cue_end
+            continue
+
+        if text in last and f' {text} ' in f' {last} ':
+            continue
+        if text in seen:
+            stats['exact'] += 1
+            continue
+
+        line = last[cut:]
+        if cut and text.startswith(line) and text.startswith(' ', len(line)) \
+                and last.find(line) == cut:
+            # Rolling: the cue goes on from where the line stands, and the
+            # line occurs nowhere earlier for a longer overlap to start at
+            overlap = len(line) + 1
+        else:
+            # An overlap starts where the cue's first word occurs
+            overlap = 0
+            first = text.partition(' ')[0]
+            if first in last:
+                needle = f' {first} '
+                padded = f' {last} '
+                i = padded.find(needle)
+                if i < 0:
+                    pass
+                elif padded.find(needle, i + 1) < 0:
+                    candidate = padded[i + 1:]
+                    if text.startswith(candidate):
+                        overlap = len(candidate)
+                else:
+                    if interned is not last:
+                        last_ids = intern_tokens(last, table)
+                    ids = intern_tokens(text, table)
+                    matched = find_overlap(last_ids, ids)
+                    if matched:
+                        overlap = len(' '.join(text.split(' ', matched)[:matched])) + 1
+                    last_ids, interned = ids, text
+
+        seen.add(last)
+        if not overlap and not pieces:
+            yield start, end, line
+            start = cue_start
+        else:
+            pieces.append(line)
+            words += line.count(' ') + 1
+            if not overlap or words >= max_words or line.endswith(SENTENCE_ENDINGS):
+                yield start, end, ' '.join(pieces)
+                pieces = []
+                words = 0
+                start = cue_start
+        last = text
+        cut = overlap
+        end = cue_end
+
+    pieces.append(last[cut:])
+    yield start, end, ' '.join(pieces)
+
+
+def lsh_rows(threshold: float, num_perm: int = MINHASH_PERMUTATIONS) -> int:
+    """
+    Rows per LSH band: the largest band (fewest spurious candidates) that
+    still makes a pair at exactly ``threshold`` similarity a candidate with
+    probability LSH_RECALL. Candidates are verified exactly afterwards.
+    """
+    best = 1
+    for rows in range(1, num_perm + 1):
+        if num_perm % rows:
+            continue
+        bands = num_perm // rows
+        if 1 - (1 - threshold ** rows) ** bands >= LSH_RECALL:
+            best = rows
+    return best
+
+
+class MinHashIndex:
+    """
+    Locality-sensitive index of recent lines for near-duplicate lookup.
+
+    Each line is reduced to a MinHash signature over its set of words and
+    bucketed by LSH bands, so a lookup only compares against lines that
+    share at least one band instead of every line in the window. Candidates
+    are confirmed with the exact Jaccard similarity of their word sets.
+    Entries older than ``window`` seconds are expired.
+    """
+
+    def __init__(self, threshold: float, window: float = DEFAULT_FUZZY_WINDOW,
+                 num_perm: int = MINHASH_PERMUTATIONS):
+        self.threshold = threshold
+        self.window = window
+        self.rows = lsh_rows(threshold, num_perm)
+        # Fixed seeds and crc32 word hashes keep signatures, and therefore
+        # the output, identical from run to run
+        rng = Random(num_perm)
+        self._seeds = [rng.getrandbits(61) for _ in range(num_perm)]
+        self._buckets = {}
+        self._entries = deque()     # (time, word set, band keys)
+
+    def signature(self, words: frozenset) -> tuple:
+        """MinHash signature: per seed, the smallest hash of (seed, word)."""
+        hashes = [zlib.crc32(word.encode()) for word in words]
+        return tuple(min(map(hash, zip(repeat(seed), hashes)))
+                     for seed in self._seeds)
+
+    def _expire(self, now: float):
+        entries = self._entries
+        while entries and entries[0][0] < now - self.window:
+            _, words, bands = entries.popleft()
+            for band in bands:
+                bucket = self._buckets[band]
+                bucket.remove(words)
+                if not bucket:
+                    del self._buckets[band]
+
+    def check_and_add(self, text: str, now: float) -> bool:
+        """True if ``text`` nearly repeats a line in the window; else index it."""
+        self._expire(now)
+        words = frozenset(text.lower().split())
+        if not words:
+            return False
+
+        signature = self.signature(words)
+        rows = self.rows
+        bands = [(i, signature[i:i + rows])
+                 for i in range(0, len(signature), rows)]
+
+        checked = set()
+        for band in bands:
+            for candidate in self._buckets.get(band, ()):
+                if id(candidate) in checked:
+                    continue
+                checked.add(id(candidate))
+                shared = len(words & candidate)
+                if shared >= self.threshold * (len(words) + len(candidate) - shared):
+                    return True
+
+        for band in bands:
+            self._buckets.setdefault(band, []).append(words)
+        self._entries.append((now, words, bands))
+        return False
+
+
+def iter_fuzzy_filter(segments, threshold: float,
+                      window: float = DEFAULT_FUZZY_WINDOW,
+                      stats: Optional[Counter] = None):
+    """
+    Drop segments that nearly repeat one kept within the last ``window``
+    seconds (e.g. a re-issued line with a one-word ASR correction); drops
+    are counted under ``stats['fuzzy']``.
+    """
+    stats = Counter() if stats is None else stats
+    stats['fuzzy'] += 0
+    index = MinHashIndex(threshold, window)
+    for start, end, text in segments:
+        if index.check_and_add(text, start / 1000):
+            stats['fuzzy'] += 1
+            continue
+        yield start, end, text
+
+
+def write_output(segments, out,
+                 include_timestamps: bool = False,
+                 output_format: str = 'txt',
+                 flush: bool = False,
+                 index: Optional[array] = None) -> int:
+    """
+    Write segments to ``out`` as they arrive; returns the number written.
+    With ``flush`` every segment is pushed out immediately (live output).
+    For jsonl output, ``index`` collects the seek entries written by
+    ``write_index``.
+    """
+    count = 0
+    offset = 0
+    latest_end = 0
+
+    if output_format == 'vtt':
+        out.write('WEBVTT\n\n')
+
+    for count, (start, end, text) in enumerate(segments, 1):
+        if output_format == 'srt':
+            out.write(f"{count}\n{format_timestamp(start, ',')} --> "
+                      f"{format_timestamp(end, ',')}\n{text}\n\n")
+        elif output_format == 'vtt':
+            out.write(f"{format_timestamp(start)} --> "
+                      f"{format_timestamp(end)}\n{text}\n\n")
+        elif output_format == 'jsonl':
+            # ASCII-only JSON, so the line length is its byte length
+            line = json.dumps({'start_ms': start, 'end_ms': end, 'text': text}) + '\n'
+            if index is not None:
+                latest_end = max(latest_end, end)
+                index.extend((latest_end, offset))
+            offset += len(line)
+            out.write(line)
+        elif include_timestamps:
+            out.write(f'[{format_clock(start)}] {text}\n')
+        else:
+            out.write(f'{text}\n')
+
+        if flush:
+            out.flush()
+
+    return count
+
+
+def write_index(path: Path, index: array):
+    """
+    Write the seek index for a jsonl transcript.
+
+    The sidecar holds a small header and then one (latest end_ms, byte
+    offset) pair of int64s per line. The first column never decreases, so
+    readers can binary-search it for the first line that ends after a
+    given time and seek straight to its offset.
+    """
+    tmp = path.with_name(f"{path.name}.tmp")
+    with open(tmp, 'wb') as f:
+        f.write(INDEX_HEADER.pack(INDEX_MAGIC, len(index) // 2))
+        index.tofile(f)
+    os.replace(tmp, path)
+
+
+def format_output(segments,
                   include_timestamps: bool = False,
                   output_format: str = 'txt') -> str:
     """Format segments into the desired output format."""
+    buffer = io.StringIO()
+    write_output(segments, buffer, include_timestamps, output_format)
+    return buffer.getvalue().removesuffix('\n')
+
+
+# Deduplication engines selectable with --merge. overlap reads better on
+# rolling captions and is the faster of the two; legacy stays as the
+# fallback for captions it merges badly
+MERGE_ENGINES = {
+    'overlap': iter_merge_overlaps,
+    'legacy': iter_deduplicate,
+}
+DEFAULT_MERGE = 'overlap'
+
+
+def counted(items, stats: Counter, key: str):
+    """Pass items through unchanged while counting them into ``stats``."""
+    for item in items:
+        stats[key] += 1
+        yield item
+
+
+def dedupe_segments(cues, stats: Counter,
+                    merge: str = DEFAULT_MERGE,
+                    seen: str = 'exact',
+                    window: int = DEFAULT_SEEN_WINDOW,
+                    fuzzy: Optional[float] = None,
+                    fuzzy_window: float = DEFAULT_FUZZY_WINDOW):
+    """Chain the configured dedupe stages over a cue stream."""
+    segments = counted(cues, stats, 'original')
+    segments = MERGE_ENGINES[merge](segments, make_seen_store(seen, window), stats)
+    if fuzzy is not None:
+        segments = iter_fuzzy_filter(segments, fuzzy, fuzzy_window, stats)
+    return segments
+
+
+def dedupe_follow(path: Path, out,
+                  include_timestamps: bool = False,
+                  output_format: str = 'txt',
+                  poll_interval: float = DEFAULT_POLL_INTERVAL,
+                  idle_timeout: Optional[float] = None,
+                  **dedupe_options) -> Counter:
+    """
+    Deduplicate a caption file that is still being written.
+
+    Only newly appended bytes are parsed and the dedup state carries over
+    between reads, so each cue costs the same however long the stream has
+    been running. A clean line is written as soon as the merge engine
+    releases it.
+    """
+    stats = Counter()
+    chunks = follow_chunks(path, poll_interval, idle_timeout)
+    segments = dedupe_segments(parse_chunks(chunks), stats, **dedupe_options)
+    stats['kept'] = write_output(segments, out, include_timestamps,
+                                 output_format, flush=True)
+    return stats
+
+
+def dedupe_stream(stream, out,
+                  include_timestamps: bool = False,
+                  output_format: str = 'txt',
+                  index: Optional[array] = None,
+                  **dedupe_options) -> Counter:
+    """Stream one caption file through parse -> dedupe -> output."""
+    stats = Counter()
+    segments = dedupe_segments(iter_cues(stream), stats, **dedupe_options)
+    stats['kept'] = write_output(segments, out, include_timestamps,
+                                 output_format, index=index)
+    return stats
+
+
+def iter_captions(source, stats: Optional[Counter] = None, **dedupe_options):
+    """
+    Lazily yield deduplicated (start_ms, end_ms, text) segments from bytes,
+    a str or a file object; ``stats`` collects the counts if given.
+    """
+    stats = Counter() if stats is None else stats
+    return dedupe_segments(parse_chunks(caption_chunks(source)), stats, **dedupe_options)
+
+
+def dedupe_captions(source,
+                    include_timestamps: bool = False,
+                    output_format: str = 'txt',
+                    on_segment=None,
+                    **dedupe_options) -> tuple[str, Counter]:
+    """
+    Library entry point: deduplicate captions from bytes, a str or a file
+    object and return the formatted transcript with its stats.
+
+    ``on_segment(start_ms, end_ms, text)`` is called for every clean line
+    as soon as the merge engine releases it, e.g. to stream results out.
+
+    Example:
+        from dedupe import dedupe_captions
+        text, stats = dedupe_captions(Path('talk.vtt').read_bytes())
+    """
+    stats = Counter()
+    segments = iter_captions(source, stats, **dedupe_options)
+    if on_segment is not None:
+        segments = _notify(segments, on_segment)
+    buffer = io.StringIO()
+    stats['kept'] = write_output(segments, buffer, include_timestamps, output_format)
+    return buffer.getvalue(), stats
+
+
+def _notify(segments, callback):
+    for segment in segments:
+        callback(*segment)
+        yield segment
+
+
+class SegmentCache:
+    """
+    Content-addressed on-disk cache of deduplicated segments.
 
-    if output_format == 'txt':
-        if include_timestamps:
-            return '\n'.join(f'[{ts}] {text}' for ts, text in segments)
+    Entries are keyed by a hash of the input bytes, PARSER_VERSION and the
+    dedupe settings, and hold the segments in a compact binary form (a
+    fixed ``<qqI`` header per segment followed by its UTF-8 text, then the
+    run's stats as JSON), so any output format can be rendered from a hit
+    without parsing the captions again. Hits refresh an entry's mtime and
+    the oldest entries are evicted once the directory exceeds ``max_bytes``.
+    """
+
+    def __init__(self, directory: Path, max_bytes: int = DEFAULT_CACHE_SIZE):
+        self.directory = Path(directory)
+        self.max_bytes = max_bytes
+
+    def key(self, input_path: Path, dedupe_options: dict) -> str:
+        digest = hashlib.sha256()
+        with open(input_path, 'rb') as f:
+            while chunk := f.read(CHUNK_SIZE):
+                digest.update(chunk)
+        settings = json.dumps(dedupe_options, sort_keys=True)
+        digest.update(f"\0{PARSER_VERSION}\0{settings}".encode())
+        return digest.hexdigest()
+
+    def _path(self, key: str) -> Path:
+        return self.directory / f"{key}{CACHE_SUFFIX}"
+
+    def load(self, key: str) -> Optional[tuple]:
+        """Return (segment iterator, stats) for a hit, or None."""
+        path = self._path(key)
+        try:
+            with open(path, 'rb') as f:
+                f.seek(-CACHE_FOOTER.size, os.SEEK_END)
+                length, magic = CACHE_FOOTER.unpack(f.read(CACHE_FOOTER.size))
+                if magic != CACHE_MAGIC:
+                    return None
+                end = f.seek(-(CACHE_FOOTER.size + length), os.SEEK_END)
+                # Entries written by older versions carry a cache_misses count
+                stats = Counter({name: count for name, count
+                                 in json.loads(f.read(length)).items()
+                                 if not name.startswith('cache_')})
+            os.utime(path)
+        except (OSError, ValueError):
+            return None
+        return self._read_segments(path, end), stats
+
+    @staticmethod
+    def _read_segments(path: Path, end: int):
+        with open(path, 'rb') as f:
+            while f.tell() < end:
+                start, stop, length = CACHE_RECORD.unpack(f.read(CACHE_RECORD.size))
+                yield start, stop, f.read(length).decode('utf-8')
+
+    def store(self, key: str, segments, stats: Counter):
+        """
+        Pass ``segments`` through while writing them to a new entry; the
+        entry is committed, with the final ``stats``, only once they are
+        exhausted.
+        """
+        self.directory.mkdir(parents=True, exist_ok=True)
+        path = self._path(key)
+        tmp = path.with_name(f"{path.name}.{os.getpid()}.tmp")
+        try:
+            with open(tmp, 'wb') as f:
+                for segment in segments:
+                    start, end, text = segment
+                    data = text.encode('utf-8')
+                    f.write(CACHE_RECORD.pack(start, end, len(data)))
+                    f.write(data)
+                    yield segment
+                footer = json.dumps(stats).encode()
+                f.write(footer)
+                f.write(CACHE_FOOTER.pack(len(footer), CACHE_MAGIC))
+            os.replace(tmp, path)
+        finally:
+            tmp.unlink(missing_ok=True)
+        self.evict()
+
+    def evict(self):
+        """Drop least recently used entries until under ``max_bytes``."""
+        entries = []
+        for path in self.directory.glob(f"*{CACHE_SUFFIX}"):
+            try:
+                stat = path.stat()
+            except FileNotFoundError:
+                continue
+            entries.append((stat.st_mtime, stat.st_size, path))
+
+        total = sum(size for _, size, _ in entries)
+        for _, size, path in sorted(entries):
+            if total <= self.max_bytes:
+                break
+            path.unlink(missing_ok=True)
+            total -= size
+
+
+def dedupe_path(input_path: Path, out,
+                include_timestamps: bool = False,
+                output_format: str = 'txt',
+                cache: Optional[SegmentCache] = None,
+                index_path: Optional[Path] = None,
+                **dedupe_options) -> Counter:
+    """
+    Deduplicate a caption file into ``out``, through ``cache`` if given.
+    For jsonl output an ``index_path`` sidecar is written alongside.
+    """
+    index = array('q') if index_path and output_format == 'jsonl' else None
+
+    with ExitStack() as stack:
+        cached = None
+        if cache is not None:
+            key = cache.key(input_path, dedupe_options)
+            cached = cache.load(key)
+
+        if cached is not None:
+            segments, stats = cached
+            stats['cache_hits'] = 1
         else:
-            return '\n'.join(text for _, text in segments)
-
-    elif output_format == 'srt':
-        lines = []
-        for i, (ts, text) in enumerate(segments, 1):
-            # Convert to SRT timestamp format
-            start = ts.replace('.', ',') + ',000'
-            # Estimate end time (add 3 seconds)
-            parts = ts.split(':')
-            end_sec = int(parts[-1]) + 3
-            end = f"{parts[0]}:{parts[1]}:{end_sec:02d},000"
-            lines.append(f"{i}\n{start} --> {end}\n{text}\n")
-        return '\n'.join(lines)
-
-    elif output_format == 'vtt':
-        lines = ['WEBVTT\n']
-        for ts, text in segments:
-            start = ts + '.000'
-            # Estimate end time
-            parts = ts.split(':')
-            end_sec = int(parts[-1]) + 3
-            end = f"{parts[0]}:{parts[1]}:{end_sec:02d}.000"
-            lines.append(f"{start} --> {end}\n{text}\n")
-        return '\n'.join(lines)
-
-    return '\n'.join(text for _, text in segments)
+            stats = Counter()
+            stream = stack.enter_context(open(input_path, encoding='utf-8'))
+            segments = dedupe_segments(iter_cues(stream), stats, **dedupe_options)
+            if cache is not None:
+                segments = cache.store(key, segments, stats)
+
+        stats['kept'] = write_output(segments, out, include_timestamps,
+                                     output_format, index=index)
+        # Only now: the entry's footer was written with the stats above
+        if cached is None and cache is not None:
+            stats['cache_misses'] = 1
+
+    if index is not None:
+        write_index(index_path, index)
+    return stats
+
+
+def dedupe_file(input_path: Path, output_path: Path, **options) -> Counter:
+    """Deduplicate ``input_path`` into ``output_path``."""
+    if options.get('output_format') == 'jsonl':
+        options['index_path'] = output_path.with_name(output_path.name + INDEX_SUFFIX)
+    try:
+        with open(output_path, 'w', encoding='utf-8') as out:
+            return dedupe_path(input_path, out, **options)
+    except BaseException:
+        # Don't leave a truncated transcript behind
+        output_path.unlink(missing_ok=True)
+        raise
+
+
+def expand_inputs(patterns: list[str], suffixes=CAPTION_SUFFIXES) -> list[Path]:
+    """
+    Expand files, directories and glob patterns into caption files;
+    directories contribute the files ending in one of ``suffixes``.
+    """
+    paths = []
+    for pattern in patterns:
+        if glob.has_magic(pattern):
+            matches = sorted(Path(p) for p in glob.glob(pattern, recursive=True))
+        else:
+            matches = [Path(pattern)]
+
+        for path in matches:
+            if path.is_dir():
+                paths.extend(sorted(p for p in path.rglob('*')
+                                    if p.suffix.lower() in suffixes))
+            else:
+                paths.append(path)
+
+    # Drop duplicates from overlapping patterns, keep first-seen order
+    return list(dict.fromkeys(paths))
+
+
+def output_path_for(input_path: Path, output_dir: Optional[Path],
+                    output_format: str) -> Path:
+    """Choose the per-file output path for batch mode."""
+    directory = output_dir or input_path.parent
+    path = directory / f"{input_path.stem}.{output_format}"
+    if path.resolve() == input_path.resolve():
+        # Never overwrite the caption file being read
+        path = directory / f"{input_path.stem}.dedup.{output_format}"
+    return path
+
+
+def batch_output_paths(inputs: list[Path], output_dir: Optional[Path],
+                       output_format: str) -> list[Path]:
+    """
+    Choose every output path of a batch up front. Inputs that would share
+    an output (talk.vtt and talk.srt) keep their caption suffix in it
+    instead (talk.vtt.txt, talk.srt.txt); raises ValueError if two jobs
+    would still write the same file or one would overwrite an input.
+    """
+    paths = [output_path_for(path, output_dir, output_format) for path in inputs]
+    counts = Counter(path.resolve() for path in paths)
+    sources = {path.resolve(): path for path in inputs}
+    for i, input_path in enumerate(inputs):
+        target = paths[i].resolve()
+        if counts[target] > 1 or target in sources:
+            paths[i] = (output_dir or input_path.parent) / f"{input_path.name}.{output_format}"
+
+    owners = {}
+    for input_path, path in zip(inputs, paths):
+        target = path.resolve()
+        if target in sources:
+            raise ValueError(f"{input_path}: output {path} is also an input")
+        other = owners.setdefault(target, input_path)
+        if other != input_path:
+            raise ValueError(f"{other} and {input_path} would both be written to {path}")
+    return paths
+
+
+def _batch_worker(job: tuple) -> tuple:
+    """Process-pool entry point; failures are returned, not raised."""
+    input_path, output_path, options = job
+    try:
+        return input_path, dedupe_file(input_path, output_path, **options), None
+    except Exception as e:
+        return input_path, None, f"{type(e).__name__}: {e}"
+
+
+def run_batch(jobs: list[tuple], workers: int) -> tuple[Counter, list]:
+    """Fan jobs out over a process pool and aggregate their stats."""
+    totals = Counter()
+    failures = []
+
+    if workers > 1 and len(jobs) > 1:
+        executor = ProcessPoolExecutor(max_workers=workers)
+        chunksize = max(1, len(jobs) // (workers * 4))
+        results = executor.map(_batch_worker, jobs, chunksize=chunksize)
+    else:
+        executor = None
+        results = map(_batch_worker, jobs)
+
+    try:
+        for input_path, stats, error in results:
+            if error:
+                failures.append((input_path, error))
+                print(f"Error: {input_path}: {error}", file=sys.stderr)
+            else:
+                totals.update(stats)
+                totals['files'] += 1
+    finally:
+        if executor:
+            executor.shutdown(cancel_futures=True)
+
+    return totals, failures
+
+
+# --serve request keys and the dedupe options they set
+SERVE_OPTIONS = {
+    'format': 'output_format',
+    'timestamps': 'include_timestamps',
+    'merge': 'merge',
+    'seen': 'seen',
+    'window': 'window',
+    'fuzzy': 'fuzzy',
+    'fuzzy_window': 'fuzzy_window',
+}
+
+
+def handle_request(request: dict, defaults: dict) -> dict:
+    """
+    Answer one --serve request.
+
+    A request names a caption file (``input``) or carries the captions
+    inline (``content``), optionally with an ``output`` path to write to
+    and any of the SERVE_OPTIONS keys to override the server's defaults.
+    Without ``output`` the transcript comes back in the response.
+    """
+    options = dict(defaults)
+    for key, option in SERVE_OPTIONS.items():
+        if key in request:
+            options[option] = request[key]
+    if options['output_format'] not in OUTPUT_FORMATS:
+        raise ValueError(f"unknown format: {options['output_format']}")
+    if options['merge'] not in MERGE_ENGINES:
+        raise ValueError(f"unknown merge engine: {options['merge']}")
+    if options['seen'] not in SEEN_STORES:
+        raise ValueError(f"unknown seen store: {options['seen']}")
+
+    output_path = Path(request['output']) if request.get('output') else None
+    if 'input' in request:
+        input_path = Path(request['input'])
+        if output_path:
+            stats = dedupe_file(input_path, output_path, **options)
+        else:
+            buffer = io.StringIO()
+            stats = dedupe_path(input_path, buffer, **options)
+            output = buffer.getvalue()
+    elif 'content' in request:
+        options.pop('cache', None)
+        output, stats = dedupe_captions(request['content'], **options)
+        if output_path:
+            output_path.write_text(output, encoding='utf-8')
+    else:
+        raise ValueError("request needs 'input' or 'content'")
+
+    response = {'ok': True, 'stats': dict(stats)}
+    if output_path:
+        response['output_path'] = str(output_path)
+    else:
+        response['output'] = output
+    return response
+
+
+def serve(requests, responses, defaults: dict) -> int:
+    """
+    Answer newline-delimited JSON requests until ``requests`` runs dry.
+
+    Every request gets exactly one response line, echoing its ``id``; a
+    failure is reported in the response rather than ending the session.
+    Returns the number of failed requests.
+    """
+    failed = 0
+    for line in requests:
+        if not line.strip():
+            continue
+        request_id = None
+        try:
+            request = json.loads(line)
+            if not isinstance(request, dict):
+                raise ValueError('request must be a JSON object')
+            request_id = request.get('id')
+            response = handle_request(request, defaults)
+        except Exception as e:
+            failed += 1
+            response = {'ok': False, 'error': f"{type(e).__name__}: {e}"}
+        responses.write(json.dumps({'id': request_id, **response}) + '\n')
+        responses.flush()
+    return failed
+
+
+def print_stats(stats: Counter, failures: Optional[list] = None):
+    """Print the --stats summary to stderr."""
+    original_count = stats['original']
+    kept = stats['kept']
+    print(f"\n--- Stats ---", file=sys.stderr)
+    if failures is not None:
+        print(f"Files: {stats['files']} ok, {len(failures)} failed", file=sys.stderr)
+    print(f"Original lines: {original_count}", file=sys.stderr)
+    print(f"After dedup: {kept}", file=sys.stderr)
+    print(f"Removed: {original_count - kept} ({100*(original_count-kept)/max(original_count,1):.1f}%)", file=sys.stderr)
+    print(f"  Exact duplicates: {stats['exact']}", file=sys.stderr)
+    if 'fuzzy' in stats:
+        print(f"  Fuzzy duplicates: {stats['fuzzy']}", file=sys.stderr)
+    if 'cache_hits' in stats or 'cache_misses' in stats:
+        print(f"Cache: {stats['cache_hits']} hits, {stats['cache_misses']} misses", file=sys.stderr)
 
 
 def main():
     parser = argparse.ArgumentParser(
         description='Deduplicate YouTube caption files'
     )
-    parser.add_argument('input', help='Input VTT/SRT file')
+    parser.add_argument('input', nargs='*',
+                        help='Input VTT/SRT files, directories or glob patterns')
     parser.add_argument('--timestamps', '-t', action='store_true',
                         help='Include timestamps in output')
-    parser.add_argument('--format', '-f', choices=['txt', 'srt', 'vtt'],
-                        default='txt', help='Output format (default: txt)')
+    parser.add_argument('--format', '-f', choices=OUTPUT_FORMATS,
+                        default='txt', help='Output format; jsonl writes one '
+                                            '{start_ms, end_ms, text} object per '
+                                            'line (default: txt)')
+    parser.add_argument('--index', type=Path, metavar='FILE',
+                        help='jsonl to stdout: also write the seek index to FILE '
+                             '(batch mode writes <output>.idx automatically)')
     parser.add_argument('--stats', '-s', action='store_true',
                         help='Print statistics to stderr')
+    parser.add_argument('--merge', choices=sorted(MERGE_ENGINES),
+                        default=DEFAULT_MERGE,
+                        help='Dedup engine: overlap stitches rolling captions '
+                             'into sentences, legacy falls back to the original '
+                             'per-cue substring check (default: %(default)s)')
+    parser.add_argument('--seen', choices=sorted(SEEN_STORES),
+                        help='Store for already-seen lines: exact keeps every '
+                             'line, window only the last --window lines, hash '
+                             '64-bit fingerprints (default: exact, or window '
+                             'when --window is given)')
+    parser.add_argument('--window', type=int,
+                        help=f'Lines remembered by --seen=window '
+                             f'(default: {DEFAULT_SEEN_WINDOW})')
+    parser.add_argument('--fuzzy', type=float, metavar='THRESHOLD',
+                        help='Also drop near-duplicate lines whose word-set '
+                             'similarity (0-1, e.g. 0.8) to a recent line '
+                             'reaches THRESHOLD')
+    parser.add_argument('--fuzzy-window', type=float, metavar='SECONDS',
+                        default=DEFAULT_FUZZY_WINDOW,
+                        help=f'How far back --fuzzy looks for repeats '
+                             f'(default: {DEFAULT_FUZZY_WINDOW:g}s)')
+    parser.add_argument('--output-dir', '-o', type=Path,
+                        help='Batch mode: directory for per-file outputs '
+                             '(default: next to each input)')
+    parser.add_argument('--jobs', '-j', type=int, default=os.cpu_count() or 1,
+                        help='Batch mode: worker processes (default: CPU count)')
+    parser.add_argument('--follow', action='store_true',
+                        help='Keep reading a caption file that is still being '
+                             'written (e.g. a live stream) and print each new '
+                             'clean line as it appears')
+    parser.add_argument('--poll-interval', type=float, metavar='SECONDS',
+                        default=DEFAULT_POLL_INTERVAL,
+                        help='--follow: longest wait between checks for new '
+                             'data (default: %(default)ss)')
+    parser.add_argument('--idle-timeout', type=float, metavar='SECONDS',
+                        help='--follow: stop once the file has not grown for '
+                             'this long (default: run until Ctrl-C)')
+    parser.add_argument('--serve', action='store_true',
+                        help='Stay running and answer JSON requests, one per '
+                             'line on stdin, with one JSON response per line '
+                             'on stdout; the other options become defaults')
+    parser.add_argument('--cache-dir', type=Path,
+                        default=os.environ.get('HUGINN_CACHE_DIR'),
+                        help='Cache deduplicated segments in this directory '
+                             '(default: $HUGINN_CACHE_DIR, caching is off '
+                             'when neither is set)')
+    parser.add_argument('--no-cache', action='store_true',
+                        help='Ignore --cache-dir/$HUGINN_CACHE_DIR')
+    parser.add_argument('--cache-size', type=int, metavar='MB',
+                        default=DEFAULT_CACHE_SIZE // (1024 * 1024),
+                        help='Evict least recently used cache entries above '
+                             'this size (default: %(default)s MB)')
 
     args = parser.parse_args()
+    if args.fuzzy is not None and not 0 < args.fuzzy <= 1:
+        parser.error('--fuzzy THRESHOLD must be between 0 and 1')
+    if args.index and args.format != 'jsonl':
+        parser.error('--index requires --format=jsonl')
+    if args.index and (args.serve or args.follow):
+        parser.error('--index applies to a single input written to stdout')
 
-    # Read input file
-    input_path = Path(args.input)
-    content = input_path.read_text(encoding='utf-8')
+    options = {
+        'include_timestamps': args.timestamps,
+        'output_format': args.format,
+        'merge': args.merge,
+        'seen': args.seen or ('window' if args.window else 'exact'),
+        'window': args.window or DEFAULT_SEEN_WINDOW,
+        'fuzzy': args.fuzzy,
+        'fuzzy_window': args.fuzzy_window,
+    }
+    if args.cache_dir and not args.no_cache:
+        options['cache'] = SegmentCache(args.cache_dir, args.cache_size * 1024 * 1024)
 
-    # Detect format and parse
-    if input_path.suffix.lower() == '.srt':
-        segments = parse_srt(content)
-    else:
-        segments = parse_vtt(content)
+    if args.serve:
+        if args.input:
+            parser.error('--serve takes its inputs from stdin requests')
+        failed = serve(sys.stdin, sys.stdout, options)
+        if args.stats:
+            print(f"Requests failed: {failed}", file=sys.stderr)
+        return
+    if not args.input:
+        parser.error('the following arguments are required: input')
+
+    if args.follow:
+        if len(args.input) != 1:
+            parser.error('--follow takes exactly one input file')
+        options.pop('cache', None)
+        stats = dedupe_follow(Path(args.input[0]), sys.stdout,
+                              poll_interval=args.poll_interval,
+                              idle_timeout=args.idle_timeout, **options)
+        if args.stats:
+            print_stats(stats)
+        return
+
+    # A single file without an output directory streams to stdout
+    if len(args.input) == 1 and not args.output_dir \
+            and not glob.has_magic(args.input[0]) \
+            and not Path(args.input[0]).is_dir():
+        stats = dedupe_path(Path(args.input[0]), sys.stdout,
+                            index_path=args.index, **options)
+        if args.stats:
+            print_stats(stats)
+        return
 
-    original_count = len(segments)
+    if args.index:
+        parser.error('--index applies to a single input written to stdout; '
+                     'batch mode writes <output>.idx itself')
+    inputs = expand_inputs(args.input)
+    if not inputs:
+        parser.error('No caption files matched the given inputs')
 
-    # Deduplicate
-    segments = deduplicate(segments)
+    try:
+        outputs = batch_output_paths(inputs, args.output_dir, args.format)
+    except ValueError as e:
+        parser.error(str(e))
+    if args.output_dir:
+        args.output_dir.mkdir(parents=True, exist_ok=True)
 
-    # Format and output
-    output = format_output(segments, args.timestamps, args.format)
-    print(output)
+    jobs = [(path, output, options) for path, output in zip(inputs, outputs)]
+    stats, failures = run_batch(jobs, max(1, args.jobs))
 
-    # Print stats if requested
     if args.stats:
-        print(f"\n--- Stats ---", file=sys.stderr)
-        print(f"Original lines: {original_count}", file=sys.stderr)
-        print(f"After dedup: {len(segments)}", file=sys.stderr)
-        print(f"Removed: {original_count - len(segments)} ({100*(original_count-len(segments))/max(original_count,1):.1f}%)", file=sys.stderr)
+        print_stats(stats, failures)
+    if failures:
+        sys.exit(1)
 
 
 if __name__ == '__main__':
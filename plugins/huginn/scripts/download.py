@@ -12,16 +12,37 @@ Usage:
 Examples:
     python download.py "https://youtube.com/watch?v=abc" --quick
     python download.py "https://youtube.com/playlist?list=xyz" --range 1-10
+    python download.py "https://youtube.com/@channel" --channel --jobs 4
     python download.py --file urls.txt --audio --output ./music/
+    python download.py --file podcasts.txt --audio m4a --jobs 4 --pipeline
+    python download.py --file urls.txt --jobs 4 --events events.jsonl
+    python download.py --file urls.txt --subs-only --subs en --auto-subs --jobs 8
+    python download.py --file urls.txt --info --refresh
+    python download.py --file urls.txt --engine subprocess
+    python download.py --file urls.txt --resume
+    python download.py --file urls.txt --order shortest --min-free 20G --dry-run
 """
 
 import argparse
+import heapq
 import json
 import os
+import re
 import shutil
+import signal
+import sqlite3
 import subprocess
 import sys
+import tempfile
+import threading
+import time
+import zlib
+from collections import Counter, deque
+from concurrent.futures import Future, ThreadPoolExecutor
 from pathlib import Path
+from urllib.parse import parse_qsl, urlencode, urlsplit, urlunsplit
+
+from dedupe import OUTPUT_FORMATS, dedupe_file, output_path_for
 
 
 # Quality format presets
@@ -36,10 +57,399 @@ QUALITY_PRESETS = {
 
 AUDIO_FORMATS = ["mp3", "m4a", "flac", "wav", "opus"]
 
+# How --pipeline converts to each audio format with ffmpeg, as yt-dlp's
+# -x would: (codec a download already in the format has, encoder arguments)
+AUDIO_ENCODERS = {
+    "mp3": ("mp3", ["-c:a", "libmp3lame", "-b:a", "192k"]),
+    "m4a": ("aac", ["-c:a", "aac"]),
+    "flac": ("flac", ["-c:a", "flac"]),
+    "wav": (None, ["-c:a", "pcm_s16le"]),
+    "opus": ("opus", ["-c:a", "libopus"]),
+}
+
+# Seconds a cancelled yt-dlp gets to clean up before it is killed
+TERMINATE_GRACE = 5.0
+
+# URLs per metadata prefetch (one yt-dlp run extracts a whole batch)
+PREFETCH_BATCH = 10
+
+# Metadata cache: how long entries stay valid (live and upcoming streams
+# change quickly, so theirs is short) and how big the cache may grow
+DEFAULT_CACHE_TTL = 24 * 3600
+LIVE_CACHE_TTL = 10 * 60
+DEFAULT_CACHE_BYTES = 256 * 1024 * 1024
+# Media URLs inside an info dict are signed and stop working after about
+# six hours, so older info is only shown, never handed to --load-info-json
+INFO_JSON_MAX_AGE = 5 * 3600
+
+# yt-dlp prints progress in this layout (--progress-template) so it can be
+# parsed exactly; missing fields come out as NA
+PROGRESS_TAG = "[progress]"
+PROGRESS_TEMPLATES = [
+    "download:[progress] download %(progress.status)s %(progress.downloaded_bytes)s "
+    "%(progress.total_bytes)s %(progress.total_bytes_estimate)s %(progress.speed)s "
+    "%(progress.eta)s %(progress.elapsed)s %(progress.filename)s",
+    "postprocess:[progress] postprocess %(progress.status)s %(progress.postprocessor)s",
+]
+RETRY_PATTERN = re.compile(r"Retrying.*\(\d+/\w+\)")
+SUBTITLE_PATTERN = re.compile(
+    r"\[info\] (?:Writing video subtitles to: (.+)|Video subtitle (\S+) is already present)")
+# ...and, with --subs-only, prints where every caption file is, written now
+# or already present from an earlier run
+SUBTITLE_TAG = "[subtitles]"
+SUBTITLE_TEMPLATE = "before_dl:[subtitles] %(requested_subtitles.:.filepath)j"
+THROTTLE_PATTERN = re.compile(
+    r"HTTP Error 429|Too Many Requests|rate[- ]limit|try again later|"
+    r"confirm you.re not a bot", re.IGNORECASE)
+
+# Progress redraws per second, across all running downloads
+RENDER_HZ = 10
+
+# A throttled host gets no new downloads for THROTTLE_PAUSE seconds,
+# doubling up to MAX_THROTTLE_PAUSE while the throttling lasts, and its
+# start rate is capped at half of what it was over the last RATE_WINDOW
+# seconds (never below MIN_HOST_RATE a second), then raised by RATE_STEP
+# per success. A throttled download is retried THROTTLED_RETRIES times on
+# top of --retries.
+THROTTLE_PAUSE = 5.0
+MAX_THROTTLE_PAUSE = 300.0
+RATE_WINDOW = 10.0
+MIN_HOST_RATE = 0.05
+RATE_STEP = 0.05
+THROTTLED_RETRIES = 10
+
+# With --min-free (or a size --order) new downloads wait, re-checking
+# every DISK_POLL seconds, while free space on the output volume, less
+# what running downloads have reserved, would fall below it. A download
+# that is merged or converted reserves DISK_RESERVE_FACTOR times its
+# size: both copies exist a while.
+DISK_POLL = 5.0
+DISK_RESERVE_FACTOR = 2
+
+# --order policies, by estimated size
+ORDERS = {
+    "input": "as given",
+    "shortest": "smallest first",
+    "largest": "largest first",
+}
+
+# Failed URLs are retried after RETRY_BACKOFF seconds, doubling each time,
+# unless yt-dlp's error says retrying can't help
+DEFAULT_RETRIES = 2
+RETRY_BACKOFF = 10.0
+PERMANENT_ERROR = re.compile(
+    r"Video unavailable|Private video|has been removed|Unsupported URL|"
+    r"HTTP Error 404|does not exist|not available in your country|members-only",
+    re.IGNORECASE)
+
+YOUTUBE_ID = re.compile(
+    r"(?:youtube(?:-nocookie)?\.com/(?:watch\?(?:.*&)?v=|shorts/|embed/|live/|v/)|youtu\.be/)([\w-]{11})"
+)
+YOUTUBE_LIST = re.compile(r"(?:youtube\.com|youtu\.be)/.*[?&]list=([\w-]+)")
+
+# Extractors whose flat entries are playlists themselves (a channel's tabs)
+NESTED_PLAYLISTS = {"YoutubeTab"}
+
+# Query parameters that only track where a link was shared
+TRACKING_PARAM = re.compile(r"utm_\w+|fbclid|gclid|igshid|mc_[ce]id|si|feature|ref_src")
+
+# Why prepare_urls (or the journal) left a URL out, for the report
+SKIP_REASONS = {
+    "duplicate": ("duplicate", "duplicates"),
+    "archived": ("in the download archive",) * 2,
+    "done": ("done in an earlier run",) * 2,
+}
+
+_print_lock = threading.Lock()
+
+
+def emit(text: str, prefix: str = ""):
+    """Print whole lines, tagged with ``prefix``, without interleaving workers."""
+    with _print_lock:
+        for line in text.splitlines() or [""]:
+            print(f"{prefix}{line}" if line else "")
+        sys.stdout.flush()
+
+
+class ChildProcesses:
+    """
+    Tracks the yt-dlp processes started by download workers, so Ctrl-C can
+    stop every one of them, not just the last.
+
+    Each child runs in its own process group: the terminal's Ctrl-C only
+    reaches this script, and cancelling signals the whole group, which
+    takes down ffmpeg and other helpers that yt-dlp started.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._running = set()
+        self.cancelled = threading.Event()
+
+    def start(self, cmd: list, **popen_args) -> subprocess.Popen:
+        """Start a child (output piped, stderr merged unless overridden)."""
+        options = {"stdout": subprocess.PIPE, "stderr": subprocess.STDOUT,
+                   "text": True, "bufsize": 1}
+        options.update(popen_args)
+        with self._lock:
+            if self.cancelled.is_set():
+                raise KeyboardInterrupt
+            process = subprocess.Popen(cmd, start_new_session=(os.name == "posix"),
+                                       **options)
+            self._running.add(process)
+            return process
+
+    def finished(self, process: subprocess.Popen):
+        with self._lock:
+            self._running.discard(process)
+
+    def cancel(self):
+        """Stop starting downloads and terminate the running ones."""
+        with self._lock:
+            self.cancelled.set()
+            running = list(self._running)
+        for process in running:
+            _signal(process, signal.SIGTERM)
+        for process in running:
+            try:
+                process.wait(timeout=TERMINATE_GRACE)
+            except subprocess.TimeoutExpired:
+                _kill(process)
+
+
+def _signal(process: subprocess.Popen, sig: int):
+    """Send ``sig`` to a child's process group (or just the child off POSIX)."""
+    try:
+        if os.name == "posix":
+            os.killpg(process.pid, sig)
+        else:
+            process.terminate()
+    except (ProcessLookupError, PermissionError):
+        pass
+
+
+def _kill(process: subprocess.Popen):
+    """Kill a child's process group outright and reap it."""
+    _signal(process, signal.SIGKILL if os.name == "posix" else signal.SIGTERM)
+    process.wait()
+
+
+class _OutputLogger:
+    """yt-dlp logger that hands every output line to ``output`` (emit() by default)."""
+
+    def __init__(self, quiet: bool = False):
+        self.quiet = quiet
+        self.output = emit
+        self.errors = 0
+
+    def debug(self, message: str):
+        # Screen output and progress lines arrive here too
+        if not self.quiet and not message.startswith("[debug] "):
+            self.output(message)
+
+    def info(self, message: str):
+        self.debug(message)
+
+    def warning(self, message: str):
+        if not self.quiet:
+            self.output(f"WARNING: {message}")
+
+    def error(self, message: str):
+        self.errors += 1
+        if not self.quiet:
+            self.output(message)
+
+
+class SubprocessEngine:
+    """Runs every extraction and download as a ``yt-dlp`` process of its own."""
+
+    name = "subprocess"
+
+    def __init__(self, children: ChildProcesses = None):
+        self.children = children or ChildProcesses()
+
+    def close(self):
+        pass
+
+    def extract(self, urls: list, extra_args: list = (), timeout: float = None):
+        """
+        Yield (info, json_line) for every video extracted from ``urls``, as
+        yt-dlp streams them out. ``timeout`` bounds the whole run.
+        """
+        try:
+            process = self.children.start(
+                ["yt-dlp", "--dump-json", "--no-download", "--ignore-errors",
+                 *extra_args, *urls],
+                stderr=subprocess.DEVNULL)
+        except KeyboardInterrupt:
+            return
+        timer = None
+        if timeout:
+            timer = threading.Timer(timeout, _kill, [process])
+            timer.start()
+        try:
+            for line in process.stdout:
+                try:
+                    yield json.loads(line), line
+                except json.JSONDecodeError:
+                    continue
+            process.wait()
+        finally:
+            if timer:
+                timer.cancel()
+            # Timed out, interrupted or abandoned by the caller: the child
+            # is in its own session, so nothing else will stop it
+            if process.poll() is None:
+                _kill(process)
+            self.children.finished(process)
+
+    def download(self, cmd: list, url: str, info_path: Path = None,
+                 output=emit) -> bool:
+        """Run ``cmd`` on ``url`` (or on ``info_path``), passing each output line to ``output``."""
+        full_cmd = cmd + (["--load-info-json", str(info_path)] if info_path else [url])
+        process = self.children.start(full_cmd)
+        try:
+            for line in process.stdout:
+                output(line.rstrip("\n"))
+            process.wait()
+        finally:
+            self.children.finished(process)
+        return process.returncode == 0 and not self.children.cancelled.is_set()
+
+
+class EmbeddedEngine:
+    """
+    Runs yt-dlp inside this process through its ``YoutubeDL`` API, so the
+    interpreter start-up and extractor imports are paid once per run
+    instead of once per yt-dlp process.
+
+    Command lines from build_command are turned into YoutubeDL options with
+    ``yt_dlp.parse_options``, so both engines download alike. A YoutubeDL
+    isn't thread-safe: every worker thread keeps one instance per command
+    line and reuses it for each URL it handles. Cancelling stops downloads
+    at their next progress update; an extraction already under way is
+    allowed to finish.
+
+    Raises ImportError if the yt_dlp module (2022.04 or newer) isn't
+    available.
+    """
+
+    name = "embedded"
+
+    def __init__(self, children: ChildProcesses = None):
+        import yt_dlp
+        from yt_dlp import parse_options  # noqa: F401  (older releases lack it)
+        self._yt_dlp = yt_dlp
+        self.children = children or ChildProcesses()
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        self._instances = []
+
+    def close(self):
+        """Close every YoutubeDL instance (this saves cookie files)."""
+        with self._lock:
+            instances, self._instances = self._instances, []
+        for ydl in instances:
+            ydl.close()
+
+    def _instance(self, argv: list, quiet: bool = False) -> tuple:
+        """This thread's (YoutubeDL, logger) for ``argv``, created on first use."""
+        instances = self._local.__dict__.setdefault("instances", {})
+        key = (tuple(argv), quiet)
+        if key not in instances:
+            options = self._yt_dlp.parse_options(list(argv)).ydl_opts
+            logger = _OutputLogger(quiet)
+            options["logger"] = logger
+            options["progress_hooks"] = [self._check_cancelled]
+            ydl = self._yt_dlp.YoutubeDL(options)
+            # --print writes to stdout even with a logger; route it the same way
+            ydl.to_stdout = lambda message, *_, **__: logger.debug(message)
+            with self._lock:
+                self._instances.append(ydl)
+            instances[key] = (ydl, logger)
+        return instances[key]
+
+    def _check_cancelled(self, status: dict):
+        if self.children.cancelled.is_set():
+            raise self._yt_dlp.utils.DownloadCancelled()
+
+    def extract(self, urls: list, extra_args: list = (), timeout: float = None):
+        """
+        Yield (info, json_line) for every video extracted from ``urls``, one
+        URL at a time. ``timeout`` is ignored; yt-dlp's own socket timeout
+        applies.
+        """
+        ydl, _ = self._instance(["--ignore-errors", *extra_args], quiet=True)
+        for url in urls:
+            if self.children.cancelled.is_set():
+                return
+            try:
+                info = ydl.extract_info(url, download=False)
+            except self._yt_dlp.utils.YoutubeDLError:
+                continue
+            if not info:
+                continue
+            if "entries" not in info:
+                entries = [(info, {})]
+            else:
+                # --dump-json gives every entry its place in the playlist;
+                # the API leaves that on the playlist, so copy it over
+                chosen = info.get("requested_entries") or range(1, len(info["entries"]) + 1)
+                entries = [(entry, {"playlist": info.get("title"),
+                                    "playlist_id": info.get("id"),
+                                    "playlist_index": index,
+                                    "playlist_autonumber": position,
+                                    "n_entries": len(info["entries"])})
+                           for position, (index, entry)
+                           in enumerate(zip(chosen, info["entries"]), 1)]
+            for entry, fields in entries:
+                if entry:
+                    entry = ydl.sanitize_info({**fields, **entry})
+                    yield entry, json.dumps(entry)
+
+    def download(self, cmd: list, url: str, info_path: Path = None,
+                 output=emit) -> bool:
+        """Download ``url`` (or ``info_path``) with ``cmd``'s options, passing each output line to ``output``."""
+        if self.children.cancelled.is_set():
+            raise KeyboardInterrupt
+        ydl, logger = self._instance(cmd[1:])
+        logger.output = output
+        logger.errors = 0
+        try:
+            if info_path:
+                ydl.download_with_info_file(str(info_path))
+            else:
+                ydl.download([url])
+        except self._yt_dlp.utils.DownloadCancelled:
+            return False
+        except self._yt_dlp.utils.YoutubeDLError as e:
+            logger.error(f"ERROR: {e}")
+            return False
+        # With --ignore-errors yt-dlp reports failures instead of raising,
+        # and its return code sticks once set, so count the errors instead
+        return logger.errors == 0 and not self.children.cancelled.is_set()
+
+
+ENGINES = ["auto", "embedded", "subprocess"]
+
+
+def make_engine(name: str = "auto", children: ChildProcesses = None):
+    """
+    Create the named engine; "auto" embeds yt-dlp when the module can be
+    imported and falls back to running the yt-dlp command otherwise.
+    """
+    if name != "subprocess":
+        try:
+            return EmbeddedEngine(children)
+        except ImportError:
+            if name == "embedded":
+                raise
+    return SubprocessEngine(children)
+
 
-def check_dependencies():
+def check_dependencies(engine=None):
     """Check if required tools are installed."""
-    if not shutil.which("yt-dlp"):
+    if not isinstance(engine, EmbeddedEngine) and not shutil.which("yt-dlp"):
         print("Error: yt-dlp not found. Install with:")
         print("  brew install yt-dlp  OR")
         print("  apt install yt-dlp   OR")
@@ -51,20 +461,472 @@ def check_dependencies():
         print("Install with: brew install ffmpeg OR apt install ffmpeg")
 
 
-def get_video_info(url: str) -> dict:
+def get_video_info(url: str, engine=None, extra_args: list = ()) -> dict:
     """Fetch video metadata without downloading."""
+    engine = engine or SubprocessEngine()
+    videos = engine.extract([url], extra_args, timeout=30)
     try:
-        result = subprocess.run(
-            ["yt-dlp", "--dump-json", "--no-download", url],
-            capture_output=True,
-            text=True,
-            timeout=30
-        )
-        if result.returncode == 0:
-            return json.loads(result.stdout)
-    except (subprocess.TimeoutExpired, json.JSONDecodeError):
-        pass
-    return {}
+        first = next(videos, None)
+        # A playlist has no single video's metadata
+        if first is None or next(videos, None) is not None:
+            return {}
+        return first[0]
+    finally:
+        videos.close()
+
+
+def video_key(url: str):
+    """Canonical cache key for a single-video URL, if it can be read off the URL."""
+    if "list=" in url:
+        # watch?v=...&list=... downloads the whole playlist
+        return None
+    match = YOUTUBE_ID.search(url)
+    return f"youtube:{match.group(1)}" if match else None
+
+
+def canonical_url(url: str) -> tuple:
+    """
+    Return (key, url) for an input URL. Every form of a YouTube video's
+    URL (youtu.be, shorts, m.youtube.com, extra parameters) becomes its
+    watch URL and a "youtube:ID" key; playlists likewise. Other URLs keep
+    their form, keyed by the URL with scheme and host lower-cased and
+    tracking parameters and fragment removed.
+    """
+    url = url.strip()
+    key = video_key(url)
+    if key:
+        return key, f"https://www.youtube.com/watch?v={key.split(':', 1)[1]}"
+    match = YOUTUBE_LIST.search(url)
+    if match:
+        playlist = match.group(1)
+        return f"youtube:playlist:{playlist}", f"https://www.youtube.com/playlist?list={playlist}"
+    parts = urlsplit(url)
+    if parts.scheme.lower() not in ("http", "https") or not parts.netloc:
+        # Search terms and the like go to yt-dlp as they are
+        return url, url
+    query = [(name, value) for name, value in parse_qsl(parts.query, keep_blank_values=True)
+             if not TRACKING_PARAM.fullmatch(name)]
+    key = urlunsplit((parts.scheme.lower(), parts.netloc.lower(), parts.path or "/",
+                      urlencode(query), ""))
+    return key, url
+
+
+def expand_playlists(urls: list, engine, extra_args: list = (),
+                     workers: int = 1) -> tuple:
+    """
+    List the entries of playlist and channel ``urls`` with flat extraction
+    (the listing only, no video pages), up to ``workers`` at a time; returns
+    (URLs in playlist order, {URL: flat entry info}). ``extra_args`` can
+    narrow the listing, e.g. with --playlist-items. A channel's tabs are
+    listed in turn. A URL that lists no entries (a single video, or one
+    that fails) stays as it is, for yt-dlp to handle whole.
+
+    Each entry keeps its playlist fields and title, so downloading it from
+    its info (--load-info-json) names the file as downloading the playlist
+    would; entries are returned as url_transparent for that.
+    """
+    def listing(url: str, depth: int = 0) -> list:
+        entries = [entry for entry, _ in
+                   engine.extract([url], ["--flat-playlist", *extra_args])]
+        if not entries or entries[0].get("_type") not in ("url", "url_transparent"):
+            return [(url, None)]
+        found = []
+        for entry in entries:
+            if depth == 0 and entry.get("ie_key") in NESTED_PLAYLISTS:
+                found.extend(listing(entry["url"], depth + 1))
+            else:
+                # yt-dlp extracts a "url" entry afresh and drops its fields;
+                # a url_transparent one keeps them over the extracted info
+                found.append((canonical_url(entry["url"])[1],
+                              {**entry, "_type": "url_transparent"}))
+        return found
+
+    expanded = []
+    entries = {}
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        for found in executor.map(listing, urls):
+            for url, entry in found:
+                expanded.append(url)
+                if entry is not None:
+                    # prepare_urls keeps a URL's first occurrence, so name
+                    # it after that entry too
+                    entries.setdefault(url, entry)
+    return expanded, entries
+
+
+def archive_path(args):
+    """The download archive build_command hands to yt-dlp, or None without --archive."""
+    if not args.archive:
+        return None
+    if isinstance(args.archive, str):
+        return Path(args.archive)
+    output_dir = Path(args.output).resolve() if args.output else Path.cwd()
+    return output_dir / ".download-archive.txt"
+
+
+def load_archive(path: Path) -> set:
+    """Entries of a yt-dlp download archive ("extractor id" lines), read once."""
+    try:
+        with open(path, encoding="utf-8") as f:
+            return {line.strip() for line in f if line.strip()}
+    except FileNotFoundError:
+        return set()
+
+
+def prepare_urls(urls: list, archive: set = None, cache=None) -> tuple:
+    """
+    Canonicalize ``urls`` and leave out duplicates and videos already in
+    ``archive``; returns (URLs to process, Counter of skip reasons).
+
+    Nothing is extracted or started for this: video IDs are read off the
+    URL, or for other sites looked up among the URLs ``cache`` has seen.
+    """
+    kept = []
+    seen = set()
+    skipped = Counter()
+    for url in urls:
+        key, url = canonical_url(url)
+        video = cache.key_for(url) if cache else video_key(url)
+        # The same video through different URLs is still the same video,
+        # whether or not the cache has seen the URL yet
+        keys = {key, video} - {None}
+        if not seen.isdisjoint(keys):
+            skipped["duplicate"] += 1
+            continue
+        seen.update(keys)
+        if archive and video and video.replace(":", " ", 1) in archive:
+            skipped["archived"] += 1
+            continue
+        kept.append(url)
+    return kept, skipped
+
+
+def format_skipped(skipped: Counter) -> str:
+    """Describe skip counts, e.g. "3 duplicates, 12 in the download archive"."""
+    return ", ".join(f"{skipped[reason]} {labels[skipped[reason] != 1]}"
+                     for reason, labels in SKIP_REASONS.items() if skipped[reason])
+
+
+def info_key(info: dict) -> str:
+    """Canonical cache key for extracted metadata."""
+    return f"{info.get('extractor_key', 'generic').lower()}:{info['id']}"
+
+
+def default_cache_path() -> Path:
+    """Metadata cache location: $HUGINN_CACHE_DIR or the user cache directory."""
+    base = os.environ.get("HUGINN_CACHE_DIR")
+    if not base:
+        base = Path(os.environ.get("XDG_CACHE_HOME") or Path.home() / ".cache") / "huginn"
+    return Path(base) / "metadata.db"
+
+
+class MetadataCache:
+    """
+    SQLite cache of yt-dlp metadata, keyed by canonical video ID.
+
+    Every entry carries its own expiry (short for live streams) and the
+    least recently used entries are evicted once the compressed data
+    outgrows ``max_bytes``. The URLs an entry was fetched through are kept
+    as aliases, so sites whose IDs can't be read off the URL hit too.
+    Safe to share between worker threads.
+    """
+
+    def __init__(self, path: Path, ttl: float = DEFAULT_CACHE_TTL,
+                 max_bytes: int = DEFAULT_CACHE_BYTES):
+        path.parent.mkdir(parents=True, exist_ok=True)
+        self.ttl = ttl
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        self.db = sqlite3.connect(path, check_same_thread=False)
+        self.db.executescript("""
+            CREATE TABLE IF NOT EXISTS entries (
+                key TEXT PRIMARY KEY,
+                fetched_at REAL NOT NULL,
+                expires_at REAL NOT NULL,
+                used_at REAL NOT NULL,
+                data BLOB NOT NULL
+            );
+            CREATE TABLE IF NOT EXISTS aliases (
+                url TEXT PRIMARY KEY,
+                key TEXT NOT NULL
+            );
+        """)
+
+    def close(self):
+        with self._lock:
+            self._evict()
+            self.db.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def key_for(self, url: str):
+        """Canonical key of ``url``, read off the URL or remembered from a fetch; None if unknown."""
+        key = video_key(url)
+        if key is None:
+            # Aliases are stored under the canonical URL; older entries
+            # under the URL as given
+            with self._lock:
+                row = self.db.execute("SELECT key FROM aliases WHERE url IN (?, ?)",
+                                      (canonical_url(url)[0], url)).fetchone()
+            key = row[0] if row else None
+        return key
+
+    def get(self, url: str):
+        """Return (info, fetched_at) for ``url`` if cached and not expired."""
+        now = time.time()
+        key = self.key_for(url)
+        if key is None:
+            return None
+        with self._lock:
+            row = self.db.execute(
+                "SELECT fetched_at, data FROM entries WHERE key = ? AND expires_at > ?",
+                (key, now)).fetchone()
+            if row is None:
+                return None
+            with self.db:
+                self.db.execute("UPDATE entries SET used_at = ? WHERE key = ?", (now, key))
+        return json.loads(zlib.decompress(row[1])), row[0]
+
+    def put(self, url: str, info: dict):
+        """
+        Cache ``info`` as fetched through ``url``. It counts as fetched at
+        its own ``epoch`` (when yt-dlp extracted it), but the TTL runs from now.
+        """
+        now = time.time()
+        live = info.get("is_live") or info.get("live_status") in ("is_live", "is_upcoming")
+        expires_at = now + (LIVE_CACHE_TTL if live else self.ttl)
+        data = zlib.compress(json.dumps(info).encode("utf-8"))
+        key = info_key(info)
+        with self._lock, self.db:
+            self.db.execute(
+                "INSERT OR REPLACE INTO entries (key, fetched_at, expires_at, used_at, data) "
+                "VALUES (?, ?, ?, ?, ?)",
+                (key, info.get("epoch") or now, expires_at, now, data))
+            self.db.execute("INSERT OR REPLACE INTO aliases (url, key) VALUES (?, ?)",
+                            (canonical_url(url)[0], key))
+
+    def import_file(self, path: Path) -> int:
+        """Load recorded ``yt-dlp --dump-json`` output (one object per line)."""
+        count = 0
+        with open(path, encoding="utf-8") as f:
+            for line in f:
+                if line.strip():
+                    info = json.loads(line)
+                    self.put(info.get("original_url") or info.get("webpage_url") or "", info)
+                    count += 1
+        return count
+
+    def _evict(self):
+        now = time.time()
+        with self.db:
+            self.db.execute("DELETE FROM entries WHERE expires_at <= ?", (now,))
+            total = self.db.execute(
+                "SELECT COALESCE(SUM(LENGTH(data)), 0) FROM entries").fetchone()[0]
+            if total > self.max_bytes:
+                for key, size in self.db.execute(
+                        "SELECT key, LENGTH(data) FROM entries ORDER BY used_at").fetchall():
+                    self.db.execute("DELETE FROM entries WHERE key = ?", (key,))
+                    total -= size
+                    if total <= self.max_bytes:
+                        break
+            self.db.execute("DELETE FROM aliases WHERE key NOT IN (SELECT key FROM entries)")
+
+
+class Journal:
+    """
+    Append-only record of a batch run: one JSON line per state change of a
+    URL (pending, running, done or failed) with its attempt count so far.
+
+    Opening a journal to resume replays it into an in-memory index, so the
+    last state of every URL is known before anything is started, and then
+    compacts the file to one line per URL. A line torn by a crash is
+    skipped. Safe to share between worker threads.
+    """
+
+    def __init__(self, path: Path, resume: bool = False):
+        self.path = path
+        self.index = {}
+        self._lock = threading.Lock()
+        if resume and path.exists():
+            with open(path, encoding="utf-8") as f:
+                for line in f:
+                    try:
+                        record = json.loads(line)
+                    except json.JSONDecodeError:
+                        continue
+                    self.index[record["url"]] = record
+            compacted = path.with_name(path.name + ".tmp")
+            with open(compacted, "w", encoding="utf-8") as f:
+                f.writelines(json.dumps(record) + "\n" for record in self.index.values())
+            os.replace(compacted, path)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        self._file = open(path, "a" if resume else "w", encoding="utf-8")
+
+    def close(self):
+        with self._lock:
+            self._file.flush()
+            os.fsync(self._file.fileno())
+            self._file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def state(self, url: str):
+        """Last recorded state of ``url``, or None if it isn't in the journal."""
+        record = self.index.get(url)
+        return record["state"] if record else None
+
+    def add(self, urls: list):
+        """Record URLs the journal doesn't know yet as pending."""
+        with self._lock:
+            for url in urls:
+                if url not in self.index:
+                    self._write(url, "pending")
+            self._file.flush()
+
+    def record(self, url: str, state: str, **fields):
+        """Record a state change; "running" counts as a new attempt."""
+        with self._lock:
+            self._write(url, state, **fields)
+            # Flushed line by line so a crash loses at most the line in progress
+            self._file.flush()
+
+    def _write(self, url: str, state: str, **fields):
+        attempts = self.index.get(url, {}).get("attempts", 0) + (state == "running")
+        record = {"url": url, "state": state, "attempts": attempts,
+                  "time": round(time.time(), 3), **fields}
+        self.index[url] = record
+        self._file.write(json.dumps(record) + "\n")
+
+
+class InfoPrefetcher:
+    """
+    Fetches metadata for many URLs ahead of their downloads.
+
+    URLs found in ``cache`` are ready at once (unless ``refresh``). The
+    rest are split into batches and each batch is extracted by a single
+    ``yt-dlp --dump-json`` run (or by the embedded engine); up to ``workers``
+    batches run at once and their results are picked up as they stream in. With ``save`` each
+    video's info is also written to a file, so the download can hand it to
+    ``--load-info-json`` instead of extracting the URL a second time.
+
+    A URL that yields several videos (a playlist) or none gets no info and
+    is downloaded from the URL as usual.
+    """
+
+    def __init__(self, urls: list, engine, workers: int = 1,
+                 batch_size: int = PREFETCH_BATCH, extra_args: list = (),
+                 save: bool = True, cache: MetadataCache = None,
+                 refresh: bool = False):
+        self.engine = engine
+        self.children = engine.children
+        self.extra_args = list(extra_args)
+        self.cache = cache
+        self.directory = tempfile.mkdtemp(prefix="huginn-info-") if save else None
+        self._lock = threading.Lock()
+        self._ready = {url: threading.Event() for url in urls}
+        self._found = {}
+        self._files = 0
+
+        pending = []
+        for url in self._ready:
+            cached = cache.get(url) if cache and not refresh else None
+            if cached is None:
+                pending.append(url)
+                continue
+            info, fetched_at = cached
+            fresh = time.time() - fetched_at < INFO_JSON_MAX_AGE
+            self._store(url, info, json.dumps(info) if fresh else None)
+            self._ready[url].set()
+
+        self._executor = ThreadPoolExecutor(max_workers=workers)
+        for start in range(0, len(pending), batch_size):
+            self._executor.submit(self._fetch, pending[start:start + batch_size])
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, *exc):
+        if exc_type is not None:
+            self.children.cancel()
+        self.close()
+
+    def close(self):
+        """Drop batches not yet started and remove the saved info files."""
+        self._executor.shutdown(wait=True, cancel_futures=True)
+        if self.directory:
+            shutil.rmtree(self.directory, ignore_errors=True)
+
+    def get(self, url: str) -> tuple:
+        """Wait for ``url``'s metadata; returns (info, info_path), ({}, None) if none."""
+        ready = self._ready[url]
+        while not ready.wait(0.2):
+            if self.children.cancelled.is_set():
+                return {}, None
+        with self._lock:
+            found = self._found.get(url)
+        return found if found else ({}, None)
+
+    def _fetch(self, batch: list):
+        remaining = list(batch)
+        try:
+            for info, line in self.engine.extract(batch, self.extra_args):
+                url = self._match(info, remaining)
+                if url is None:
+                    continue
+                # URLs are extracted in order, so everything
+                # before this one is complete
+                position = remaining.index(url)
+                self._complete(remaining[:position])
+                del remaining[:position]
+                self._store(url, info, line)
+        finally:
+            if not self.children.cancelled.is_set():
+                self._complete(remaining)
+            for url in batch:
+                self._ready[url].set()
+
+    @staticmethod
+    def _match(info: dict, remaining: list):
+        """Find the URL in ``remaining`` that ``info`` was extracted from."""
+        for key in ("original_url", "webpage_url"):
+            if info.get(key) in remaining:
+                return info[key]
+        video_id = info.get("id")
+        if video_id:
+            for url in remaining:
+                if video_id in url:
+                    return url
+        return None
+
+    def _store(self, url: str, info: dict, line: str = None):
+        with self._lock:
+            if url in self._found:
+                # More than one video: a playlist, leave it to yt-dlp
+                self._found[url] = None
+                return
+            path = None
+            if self.directory and line:
+                self._files += 1
+                path = Path(self.directory) / f"{self._files}.info.json"
+                path.write_text(line, encoding="utf-8")
+            self._found[url] = (info, path)
+
+    def _complete(self, urls: list):
+        """Mark fully extracted URLs ready, caching single-video results."""
+        for url in urls:
+            with self._lock:
+                found = self._found.get(url)
+            if found and self.cache and "id" in found[0]:
+                self.cache.put(url, found[0])
+            self._ready[url].set()
 
 
 def format_size(bytes_size: int) -> str:
@@ -78,15 +940,689 @@ def format_size(bytes_size: int) -> str:
     return f"{bytes_size:.1f} TB"
 
 
+def parse_size(text: str) -> int:
+    """Bytes in a size like "500M" or "20G" (plain numbers are bytes)."""
+    match = re.fullmatch(r"(\d+(?:\.\d+)?)\s*([KMGT]?)i?B?", text.strip(), re.IGNORECASE)
+    if not match:
+        raise ValueError(f"not a size: {text!r}")
+    return int(float(match.group(1)) * 1024 ** " KMGT".index(match.group(2).upper() or " "))
+
+
+def estimate_size(info: dict):
+    """The bytes downloading ``info`` should take, or None if it doesn't say."""
+    if not info:
+        return None
+    formats = info.get("requested_formats") or [info]
+    sizes = [fmt.get("filesize") or fmt.get("filesize_approx") for fmt in formats]
+    if all(sizes):
+        return int(sum(sizes))
+    return info.get("filesize_approx") or None
+
+
+def show_info(url: str, info: dict):
+    """Print the --info summary for one URL."""
+    if info:
+        print(f"\nTitle: {info.get('title', 'Unknown')}")
+        print(f"Duration: {info.get('duration_string', 'Unknown')}")
+        print(f"Uploader: {info.get('uploader', 'Unknown')}")
+        print(f"Est. size: {format_size(estimate_size(info))}")
+        print(f"URL: {url}")
+
+
+def _number(text: str):
+    """A progress field as a float, or None for yt-dlp's NA."""
+    try:
+        return float(text)
+    except ValueError:
+        return None
+
+
+class EventLog:
+    """Appends download events to a file as JSON lines; shared by all workers."""
+
+    def __init__(self, path: Path):
+        self._lock = threading.Lock()
+        self._file = open(path, "a", encoding="utf-8", buffering=1)
+
+    def write(self, event: dict):
+        line = json.dumps(event)
+        with self._lock:
+            self._file.write(line + "\n")
+
+    def close(self):
+        with self._lock:
+            self._file.close()
+
+
+class ProgressRenderer:
+    """
+    Draws progress lines on the terminal at most ``hz`` times a second.
+
+    Between redraws only each download's latest progress line is kept, and
+    a redraw prints them all at once. Other output is printed straight away.
+    """
+
+    def __init__(self, hz: float = RENDER_HZ):
+        self.interval = 1 / hz
+        self._lock = threading.Lock()
+        self._pending = {}
+        self._drawn_at = 0.0
+
+    def progress(self, line: str, prefix: str = "", final: bool = False):
+        with self._lock:
+            self._pending[prefix] = line
+            now = time.monotonic()
+            if not final and now - self._drawn_at < self.interval:
+                return
+            self._drawn_at = now
+            pending, self._pending = self._pending, {}
+        for pending_prefix, pending_line in pending.items():
+            emit(pending_line, pending_prefix)
+
+    def line(self, text: str, prefix: str = ""):
+        """Print an ordinary line; it supersedes the download's pending progress."""
+        self.discard(prefix)
+        emit(text, prefix)
+
+    def discard(self, prefix: str = ""):
+        with self._lock:
+            self._pending.pop(prefix, None)
+
+
+class DownloadMonitor:
+    """
+    Follows one URL's yt-dlp output, line by line (it is the ``output`` an
+    engine writes to).
+
+    Progress lines (see PROGRESS_TEMPLATES) become structured events for
+    ``events`` and are drawn through ``renderer``; everything else is
+    printed as it comes. Along the way it adds up what the summary
+    reports: bytes transferred, retries, and the time spent in each phase.
+    """
+
+    PHASES = ("extract", "download", "merge", "postprocess")
+
+    def __init__(self, url: str, prefix: str = "", renderer: ProgressRenderer = None,
+                 events: EventLog = None):
+        self.url = url
+        self.prefix = prefix
+        self.renderer = renderer or ProgressRenderer()
+        self.events = events
+        self.phases = dict.fromkeys(self.PHASES, 0.0)
+        self.retries = 0
+        self.throttled = 0
+        self.error = None
+        self.filename = None
+        self.subtitles = []
+        self._present = []
+        self.ok = None
+        self.seconds = 0.0
+        self._files = {}
+        self._phase = None
+        self._since = 0.0
+        self._started = None
+
+    def start(self):
+        self._started = time.monotonic()
+        self._enter("extract")
+        self._event("start")
+
+    def finish(self, ok: bool) -> dict:
+        self._enter(None)
+        self.ok = ok
+        self.seconds = time.monotonic() - self._started
+        self.renderer.discard(self.prefix)
+        summary = self.summary()
+        del summary["url"]
+        self._event("finish", **summary)
+        return summary
+
+    @property
+    def transferred(self) -> int:
+        """Bytes downloaded so far."""
+        return int(sum(self._files.values()))
+
+    def summary(self) -> dict:
+        transferred = self.transferred
+        download = self.phases["download"]
+        return {
+            "url": self.url,
+            "ok": self.ok,
+            "bytes": transferred,
+            "seconds": round(self.seconds, 3),
+            "throughput": round(transferred / download) if download else None,
+            "retries": self.retries,
+            "throttled": self.throttled,
+            "phases": {phase: round(spent, 3) for phase, spent in self.phases.items()},
+            "error": self.error,
+        }
+
+    def __call__(self, text: str):
+        for line in text.splitlines() or [""]:
+            if line.startswith(PROGRESS_TAG):
+                self._progress(line[len(PROGRESS_TAG):].split(None, 8))
+                continue
+            if THROTTLE_PATTERN.search(line):
+                self.throttled += 1
+            if line.startswith(SUBTITLE_TAG):
+                self._present_subtitles(line[len(SUBTITLE_TAG):])
+                continue
+            subtitle = SUBTITLE_PATTERN.match(line)
+            if subtitle and subtitle.group(1):
+                self.subtitles.append(Path(subtitle.group(1)))
+            elif subtitle:
+                self._present.append(subtitle.group(2))
+            if line.startswith("ERROR:"):
+                self.error = line
+            elif RETRY_PATTERN.search(line):
+                self.retries += 1
+                self._event("retry", message=line)
+            self.renderer.line(line, self.prefix)
+
+    def _present_subtitles(self, text: str):
+        """Resolve the tracks yt-dlp found already present to their files."""
+        try:
+            paths = json.loads(text) or []
+        except json.JSONDecodeError:
+            return
+        for track in self._present:
+            self.subtitles.extend(Path(path) for path in paths
+                                  if path and path.endswith(f".{track}"))
+        self._present = []
+
+    def _enter(self, phase):
+        now = time.monotonic()
+        if self._phase:
+            self.phases[self._phase] += now - self._since
+        self._phase = phase
+        self._since = now
+
+    def _event(self, kind: str, **fields):
+        if self.events:
+            self.events.write({"time": round(time.time(), 3), "url": self.url,
+                               "event": kind, **fields})
+
+    def _progress(self, fields: list):
+        if fields[:1] == ["postprocess"] and len(fields) == 3:
+            _, status, name = fields
+            phase = "merge" if name == "Merger" else "postprocess"
+            if status == "started":
+                self._enter(phase)
+            elif status == "finished":
+                self._enter(None)
+            self._event("phase", phase=phase, status=status, postprocessor=name)
+            return
+        if fields[:1] != ["download"] or len(fields) < 8:
+            return
+
+        status = fields[1]
+        downloaded, total, estimate, speed, eta, elapsed = map(_number, fields[2:8])
+        filename = fields[8] if len(fields) > 8 else ""
+        if self._phase != "download":
+            self._enter("download")
+        if status == "finished":
+            self.filename = filename
+            # A file that was already on disk finishes without an elapsed time
+            if elapsed is not None:
+                self._files[filename] = total or downloaded or 0
+        elif downloaded is not None:
+            self._files[filename] = downloaded
+        total = total or estimate
+        self._event("progress", phase="download", status=status, file=filename,
+                    downloaded_bytes=downloaded, total_bytes=total, speed=speed, eta=eta)
+
+        if status == "finished":
+            line = f"[download] 100% of {format_size(total or downloaded)}"
+            if elapsed:
+                line += f" in {elapsed:.1f}s"
+        else:
+            line = "[download] "
+            if total:
+                line += f"{100 * (downloaded or 0) / total:5.1f}% of {format_size(total)}"
+            else:
+                line += format_size(downloaded)
+            if speed:
+                line += f" at {format_size(speed)}/s"
+            if eta is not None:
+                line += f" ETA {int(eta) // 60}:{int(eta) % 60:02d}"
+        self.renderer.progress(line, self.prefix, final=(status == "finished"))
+
+
+def format_result(result: dict) -> str:
+    """One summary line for a download: bytes, throughput, phases, retries."""
+    line = format_size(result["bytes"]) if result["bytes"] else "0 B"
+    if result["throughput"]:
+        line += f" at {format_size(result['throughput'])}/s"
+    phases = [f"{phase} {spent:.1f}s" for phase, spent in result["phases"].items() if spent]
+    if phases:
+        line += " | " + ", ".join(phases)
+    if result["retries"]:
+        line += f" | {result['retries']} retr{'y' if result['retries'] == 1 else 'ies'}"
+    return line
+
+
+class TranscodePool:
+    """
+    Converts downloaded audio to ``audio_format`` with ffmpeg on a pool of
+    its own (one process per core by default), so encoding runs alongside
+    the downloads instead of holding their slots. The result replaces the
+    download in its directory, as yt-dlp -x leaves it; audio already in
+    the format's codec is only remuxed.
+    """
+
+    phase = "transcode"
+    action = "converting"
+
+    def __init__(self, audio_format: str, children: ChildProcesses,
+                 workers: int = None):
+        self.audio_format = audio_format
+        self.children = children
+        self._executor = ThreadPoolExecutor(max_workers=workers or os.cpu_count() or 1)
+
+    def submit(self, monitor: DownloadMonitor):
+        """
+        Queue the file ``monitor``'s download produced; the future gives
+        the seconds the conversion took. None if there is no file.
+        """
+        if not monitor.filename:
+            return None
+        return self._executor.submit(self._convert, Path(monitor.filename))
+
+    def close(self, cancel: bool = False):
+        """Wait for the conversions (with ``cancel``, only those under way)."""
+        self._executor.shutdown(wait=True, cancel_futures=cancel)
+
+    @staticmethod
+    def _codec(source: Path):
+        """The first audio stream's codec, if ffprobe can tell."""
+        if not shutil.which("ffprobe"):
+            return None
+        probe = subprocess.run(
+            ["ffprobe", "-v", "error", "-select_streams", "a:0",
+             "-show_entries", "stream=codec_name", "-of", "csv=p=0", str(source)],
+            capture_output=True, text=True)
+        return probe.stdout.strip() or None
+
+    def _convert(self, source: Path) -> float:
+        started = time.monotonic()
+        target = source.with_suffix(f".{self.audio_format}")
+        if target == source:
+            return 0.0
+        if target.exists():
+            # --no-overwrites: an earlier run converted it already
+            source.unlink(missing_ok=True)
+            return 0.0
+        codec, encoder = AUDIO_ENCODERS[self.audio_format]
+        if codec and self._codec(source) == codec:
+            encoder = ["-c:a", "copy"]
+        partial = target.with_name(f"{target.stem}.part{target.suffix}")
+        process = self.children.start(
+            ["ffmpeg", "-nostdin", "-y", "-loglevel", "error", "-i", str(source),
+             "-vn", *encoder, str(partial)])
+        try:
+            output = process.stdout.read()
+            process.wait()
+        finally:
+            self.children.finished(process)
+        if process.returncode != 0:
+            partial.unlink(missing_ok=True)
+            lines = output.strip().splitlines()
+            raise RuntimeError(lines[-1] if lines else f"ffmpeg exited with {process.returncode}")
+        os.replace(partial, target)
+        source.unlink()
+        return time.monotonic() - started
+
+
+class TranscriptWriter:
+    """
+    Turns the caption files each download wrote into transcripts with
+    dedupe.py while the next downloads run: finished downloads are queued
+    to a worker of their own. Every track becomes ``<name>.<output_format>``
+    beside its caption file, with timestamps, ready for transcript_index.py.
+    """
+
+    phase = "dedupe"
+    action = "writing transcript"
+
+    def __init__(self, output_format: str = "txt"):
+        self.output_format = output_format
+        self._executor = ThreadPoolExecutor(max_workers=1)
+
+    def submit(self, monitor: DownloadMonitor):
+        """Queue the caption files ``monitor``'s download wrote; the future gives the seconds taken."""
+        if not monitor.subtitles:
+            failed = Future()
+            failed.set_exception(RuntimeError("no captions in the requested languages"))
+            return failed
+        return self._executor.submit(self._write, list(monitor.subtitles))
+
+    def close(self, cancel: bool = False):
+        """Wait for the queued transcripts (with ``cancel``, only the one under way)."""
+        self._executor.shutdown(wait=True, cancel_futures=cancel)
+
+    def _write(self, captions: list) -> float:
+        started = time.monotonic()
+        for caption in captions:
+            dedupe_file(caption, output_path_for(caption, None, self.output_format),
+                        include_timestamps=True, output_format=self.output_format)
+        return time.monotonic() - started
+
+
+def host_key(url: str) -> str:
+    """The host a URL's requests go to, as the scheduler groups them."""
+    key, _ = canonical_url(url)
+    if key.startswith("youtube:"):
+        return "youtube"
+    host = urlsplit(url).hostname or ""
+    return host[4:] if host.startswith("www.") else host or "other"
+
+
+class DownloadTask:
+    """One URL's place in the download queue."""
+
+    def __init__(self, index: int, url: str):
+        self.index = index
+        self.url = url
+        self.host = host_key(url)
+        self.attempt = 0
+        self.throttled = 0
+        self.not_before = 0.0
+        self.started = 0.0
+        # Peak bytes on disk, if known (see run_downloads)
+        self.size = None
+        self.monitor = None
+        # Sent back to the queue once its size was known / why the disk
+        # budget gave up on it
+        self.deferred = False
+        self.no_room = None
+
+    @property
+    def written(self) -> int:
+        """Bytes the current attempt has downloaded."""
+        return self.monitor.transferred if self.monitor else 0
+
+    def __lt__(self, other):
+        return (self.not_before, self.index) < (other.not_before, other.index)
+
+
+def order_urls(urls: list, sizes: dict, order: str = "input") -> list:
+    """
+    ``urls`` in the download order of an ORDERS policy, by their estimated
+    ``sizes``; URLs without an estimate keep their order, after the rest.
+    """
+    if order == "input":
+        return list(urls)
+    known = sorted((url for url in urls if sizes.get(url)), key=sizes.get,
+                   reverse=(order == "largest"))
+    return known + [url for url in urls if not sizes.get(url)]
+
+
+class DiskBudget:
+    """
+    Keeps a batch from filling the output volume. Every running download
+    holds a reservation of its size (DownloadTask.size) less what it has
+    written so far; another may only start while free space, less those
+    reservations and its own, stays above ``watermark`` bytes. Downloads
+    without a size reserve nothing and are never held.
+    """
+
+    def __init__(self, path: Path, watermark: int = 0):
+        self.path = path
+        self.watermark = watermark
+
+    def free(self) -> int:
+        return shutil.disk_usage(self.path).free
+
+    def reservation(self, task: DownloadTask) -> int:
+        """What ``task`` may still write."""
+        return max(0, (task.size or 0) - task.written)
+
+    def fits(self, task: DownloadTask, running) -> bool:
+        """Whether ``task`` can start alongside the ``running`` ones."""
+        reserved = sum(self.reservation(other) for other in running)
+        return self.free() - reserved - self.reservation(task) >= self.watermark
+
+
+def print_plan(urls: list, infos: dict, order: str, disk: DiskBudget):
+    """Print the --dry-run report: the download order and projected disk use."""
+    sizes = {url: estimate_size(infos.get(url)) for url in urls}
+    room = disk.free() - disk.watermark
+    print(f"\nPlanned order ({ORDERS[order]}):")
+    print(f"{'#':>5}  {'Size':>10}  {'Total':>10}  Title")
+    total = 0
+    runs_out = None
+    for n, url in enumerate(order_urls(urls, sizes, order), 1):
+        total += sizes[url] or 0
+        if runs_out is None and total > room:
+            runs_out = n
+        title = (infos.get(url) or {}).get("title") or url
+        size = format_size(sizes[url]) if sizes[url] else "?"
+        print(f"{n:>5}  {size:>10}  {format_size(total) if total else '-':>10}  {title}")
+
+    unknown = sum(1 for size in sizes.values() if not size)
+    print(f"\nProjected: {format_size(total) if total else '0 B'} for {len(urls)} URLs"
+          + (f" ({unknown} without a size estimate)" if unknown else ""))
+    print(f"Free: {format_size(disk.free())} on {disk.path}, "
+          f"keeping {format_size(disk.watermark)}")
+    if runs_out:
+        print(f"⚠ Space runs out at #{runs_out}: downloads would wait there for room")
+    else:
+        print("✓ Fits")
+
+
+class _HostState:
+    def __init__(self, limit: float, rate: float):
+        self.queue = deque()
+        self.delayed = []
+        self.running = 0
+        self.starts = deque()
+        self.limit = limit
+        self.rate = rate
+        self.tokens = 1.0
+        self.refilled = time.monotonic()
+        self.paused_until = 0.0
+        self.pause = 0.0
+        self.backed_off = 0.0
+
+
+class HostScheduler:
+    """
+    Hands queued downloads to workers, host by host (see host_key).
+
+    Each host has a token bucket that lets its downloads start at most
+    ``rate`` times a second (no limit if None) and a concurrency limit run
+    by AIMD. A download that saw throttling (HTTP 429 and the like) halves
+    the limit, caps the rate at half the host's recent start rate and
+    pauses the host, the pause doubling while throttling goes on. Every
+    success adds 1/limit, so the limit grows by one per round of
+    successes up to ``jobs``, and adds RATE_STEP to the rate up to
+    ``rate``. Only downloads started after the last back-off can trigger
+    another. Without ``adaptive`` every host keeps ``jobs`` and ``rate``.
+
+    Hosts take turns, so one that is throttled or paused doesn't hold up
+    the rest, and a retry waits out its backoff in the queue rather than
+    in a worker. With a ``disk`` budget nothing starts while the next
+    download wouldn't fit on the output volume. Once nothing is running
+    that could make room, it starts anyway if it fits below the
+    watermark, and is handed out marked ``no_room`` if it can't fit at all.
+    """
+
+    def __init__(self, jobs: int, rate: float = None, adaptive: bool = True,
+                 disk: DiskBudget = None):
+        self.jobs = jobs
+        self.rate = rate
+        self.adaptive = adaptive
+        self.disk = disk
+        self._cond = threading.Condition()
+        self._running = set()
+        self._holding = False
+        self._hosts = {}
+        self._turn = 0
+        self._unfinished = 0
+        self._cancelled = False
+
+    def add(self, task: DownloadTask):
+        with self._cond:
+            host = self._hosts.get(task.host)
+            if host is None:
+                host = self._hosts[task.host] = _HostState(self.jobs, self.rate)
+            host.queue.append(task)
+            self._unfinished += 1
+            self._cond.notify()
+
+    def cancel(self):
+        """Wake every waiting worker and hand out nothing more."""
+        with self._cond:
+            self._cancelled = True
+            self._cond.notify_all()
+
+    def next(self):
+        """Wait for a task that may start now; None once all are finished."""
+        with self._cond:
+            while True:
+                if self._cancelled or not self._unfinished:
+                    return None
+                now = time.monotonic()
+                wake = None
+                names = list(self._hosts)
+                for n in range(len(names)):
+                    name = names[(self._turn + n) % len(names)]
+                    host = self._hosts[name]
+                    ready_at = self._ready_at(host, now)
+                    if ready_at is None:
+                        continue
+                    if ready_at > now:
+                        wake = ready_at if wake is None else min(wake, ready_at)
+                        continue
+                    retry = bool(host.delayed) and host.delayed[0].not_before <= now
+                    task = host.delayed[0] if retry else host.queue[0]
+                    needs = self.disk.reservation(task) if self.disk else 0
+                    if needs and not self.disk.fits(task, self._running):
+                        if self._running:
+                            if not self._holding:
+                                self._holding = True
+                                emit(f"⚠ Low on disk space ({format_size(self.disk.free())} "
+                                     f"free, keeping {format_size(self.disk.watermark)}): "
+                                     f"holding new downloads")
+                            wake = now + DISK_POLL
+                            break
+                        # Waiting won't help with nothing under way
+                        free = self.disk.free()
+                        if needs <= free:
+                            emit(f"⚠ {task.url} needs {format_size(needs)}: leaves less "
+                                 f"than {format_size(self.disk.watermark)} free, "
+                                 f"starting anyway")
+                        else:
+                            task.no_room = (f"needs {format_size(needs)}, "
+                                            f"{format_size(free) if free else '0 B'} free")
+                    elif needs and self._holding:
+                        self._holding = False
+                        emit("Disk space available again, resuming")
+                    if retry:
+                        heapq.heappop(host.delayed)
+                    else:
+                        host.queue.popleft()
+                    self._running.add(task)
+                    host.running += 1
+                    host.starts.append(now)
+                    if host.rate:
+                        host.tokens -= 1
+                    self._turn = (self._turn + n + 1) % len(names)
+                    task.attempt += 1
+                    task.started = now
+                    return task
+                self._cond.wait(None if wake is None else wake - now)
+
+    def over_budget(self, task: DownloadTask) -> bool:
+        """Whether ``task``, already handed out, doesn't fit beside the others running."""
+        with self._cond:
+            return bool(self.disk) and not self.disk.fits(task, self._running - {task})
+
+    def _ready_at(self, host: _HostState, now: float):
+        """When ``host`` may start its next task; None if it has none or no free slot."""
+        if host.running >= int(host.limit):
+            return None
+        if host.queue:
+            ready_at = now
+        elif host.delayed:
+            ready_at = host.delayed[0].not_before
+        else:
+            return None
+        if host.rate:
+            host.tokens = min(max(1.0, float(self.jobs)),
+                              host.tokens + (now - host.refilled) * host.rate)
+            host.refilled = now
+            if host.tokens < 1:
+                ready_at = max(ready_at, now + (1 - host.tokens) / host.rate)
+        return max(ready_at, host.paused_until)
+
+    def finish(self, task: DownloadTask, ok: bool, throttled: bool,
+               retry_in: float = None):
+        """
+        Free the task's slot and adapt its host's limits. With ``retry_in``
+        the task goes back in the queue for another attempt after that many
+        seconds. Returns a note to print when the host was throttled.
+        """
+        note = None
+        with self._cond:
+            host = self._hosts[task.host]
+            host.running -= 1
+            self._running.discard(task)
+            now = time.monotonic()
+            while host.starts and host.starts[0] < now - RATE_WINDOW:
+                host.starts.popleft()
+            if self.adaptive and throttled and task.started >= host.backed_off:
+                first = host.starts[0] if host.starts else task.started
+                recent = max(1, len(host.starts)) / max(1.0, now - first)
+                host.limit = max(1.0, host.limit / 2)
+                host.rate = max(MIN_HOST_RATE, min(host.rate or recent, recent) / 2)
+                host.tokens = min(host.tokens, 1.0)
+                host.pause = min(MAX_THROTTLE_PAUSE, host.pause * 2 or THROTTLE_PAUSE)
+                host.paused_until = now + host.pause
+                host.backed_off = now
+                note = (f"⚠ {task.host} is throttling: {int(host.limit)} at a time, "
+                        f"{60 * host.rate:.0f}/min, pausing {host.pause:.0f}s")
+            elif self.adaptive and ok and not throttled:
+                host.limit = min(float(self.jobs), host.limit + 1 / host.limit)
+                host.pause = 0.0
+                if host.rate:
+                    host.rate = min(self.rate or float("inf"), host.rate + RATE_STEP)
+            if retry_in is None or self._cancelled:
+                self._unfinished -= 1
+            else:
+                task.not_before = now + retry_in
+                heapq.heappush(host.delayed, task)
+            self._cond.notify_all()
+        return note
+
+
+def audio_format(name: str) -> str:
+    """The --audio format to convert to (mp3 unless it is one of AUDIO_FORMATS)."""
+    return name if name in AUDIO_FORMATS else "mp3"
+
+
+def format_selection(cmd: list) -> list:
+    """The format choice in ``cmd``, so extraction reports what it would download."""
+    if "-f" in cmd:
+        return ["-f", cmd[cmd.index("-f") + 1]]
+    # -x picks the best audio when no format is given
+    return ["-f", "bestaudio/best"] if "-x" in cmd else []
+
+
 def build_command(args) -> list:
     """Build yt-dlp command from arguments."""
     cmd = ["yt-dlp"]
 
-    # Quality/format selection
-    if args.audio:
-        audio_format = args.audio if args.audio in AUDIO_FORMATS else "mp3"
-        cmd.extend(["-x", "--audio-format", audio_format])
-        if audio_format == "mp3":
+    # Quality/format selection (captions alone need neither)
+    if args.subs_only:
+        cmd.extend(["--skip-download", "--sub-format", "vtt/srt/best",
+                    "--no-quiet", "--print", SUBTITLE_TEMPLATE])
+    elif args.audio and args.pipeline:
+        # Only the download: TranscodePool converts it
+        cmd.extend(["-f", "bestaudio/best"])
+    elif args.audio:
+        cmd.extend(["-x", "--audio-format", audio_format(args.audio)])
+        if audio_format(args.audio) == "mp3":
             cmd.extend(["--audio-quality", "192K"])
     else:
         quality = args.quality or "best"
@@ -116,14 +1652,15 @@ def build_command(args) -> list:
 
     # Archive tracking
     if args.archive:
-        archive_file = args.archive if isinstance(args.archive, str) else str(output_dir / ".download-archive.txt")
-        cmd.extend(["--download-archive", archive_file])
+        cmd.extend(["--download-archive", str(archive_path(args))])
 
     # Subtitles
-    if args.subs:
+    if args.subs or args.subs_only:
         cmd.append("--write-subs")
-        if args.subs != True:  # Specific language
+        if args.subs and args.subs != True:  # Specific language
             cmd.extend(["--sub-langs", args.subs])
+    if args.auto_subs:
+        cmd.append("--write-auto-subs")
 
     # Thumbnail
     if args.thumb:
@@ -141,6 +1678,8 @@ def build_command(args) -> list:
     cmd.extend([
         "--progress",
         "--newline",
+        "--progress-template", PROGRESS_TEMPLATES[0],
+        "--progress-template", PROGRESS_TEMPLATES[1],
         "--ignore-errors",
         "--no-overwrites",
         "--restrict-filenames",
@@ -149,38 +1688,254 @@ def build_command(args) -> list:
     return cmd
 
 
-def download_url(url: str, cmd: list, show_info: bool = True):
-    """Download a single URL."""
+def download_url(url: str, cmd: list, show_info: bool = True,
+                 prefix: str = "", engine=None,
+                 info: dict = None, info_path: Path = None,
+                 monitor: DownloadMonitor = None):
+    """
+    Download a single URL, tagging its output lines with ``prefix``.
+
+    Prefetched ``info`` replaces the metadata probe, and with ``info_path``
+    yt-dlp loads that file instead of extracting the URL again. The output
+    goes through ``monitor``, which holds the download's totals afterwards.
+    """
+    engine = engine or SubprocessEngine()
     if show_info:
-        info = get_video_info(url)
-        if info:
+        if info is None:
+            info = get_video_info(url, engine)
+        if info and not engine.children.cancelled.is_set():
             title = info.get("title", "Unknown")
             duration = info.get("duration_string", "Unknown")
-            size = format_size(info.get("filesize_approx", 0))
-            print(f"\n📹 {title}")
-            print(f"   Duration: {duration} | Est. size: {size}")
-
-    full_cmd = cmd + [url]
+            size = format_size(estimate_size(info))
+            emit(f"\n📹 {title}", prefix)
+            emit(f"   Duration: {duration} | Est. size: {size}", prefix)
 
+    monitor = monitor or DownloadMonitor(url, prefix)
+    monitor.start()
+    ok = False
     try:
-        process = subprocess.Popen(
-            full_cmd,
-            stdout=subprocess.PIPE,
-            stderr=subprocess.STDOUT,
-            text=True,
-            bufsize=1
-        )
+        ok = engine.download(cmd, url, info_path, monitor)
+    finally:
+        monitor.finish(ok)
+    return ok
+
+
+def run_downloads(urls: list, cmd: list, jobs: int = 1,
+                  prefetch: bool = True, batch_size: int = PREFETCH_BATCH,
+                  info_args: list = (), cache: MetadataCache = None,
+                  refresh: bool = False, engine=None,
+                  events: EventLog = None, journal: Journal = None,
+                  retries: int = 0, host_rate: float = None,
+                  adaptive: bool = True, entries: dict = None,
+                  stage=None, order: str = "input",
+                  disk: DiskBudget = None) -> tuple:
+    """
+    Download ``urls`` with up to ``jobs`` at a time; returns (success,
+    failed, results), results holding each started URL's DownloadMonitor
+    summary (of its last attempt) in download order.
+
+    With more than one job, every output line carries its URL's [i/n] tag
+    so concurrent downloads stay readable. Ctrl-C cancels all of them.
+    With ``prefetch``, metadata comes from ``cache`` or is extracted in
+    batches alongside the downloads (see InfoPrefetcher), and each
+    download reuses it. ``engine`` runs yt-dlp (a SubprocessEngine by default)
+    and ``events`` receives every download's progress events.
+
+    Downloads are started per host by a HostScheduler: at most
+    ``host_rate`` a second, and as many at once as the host tolerates
+    without throttling (with ``adaptive``; otherwise always ``jobs``).
+    Downloads go in ``order`` (see ORDERS), which with a policy other than
+    "input" waits for every URL's prefetched size first, and within the
+    ``disk`` budget.
+
+    URLs in ``entries`` (from expand_playlists) are downloaded from their
+    flat entry info, which keeps their place in the playlist.
+
+    With a ``stage`` (TranscodePool, TranscriptWriter) each finished
+    download is handed to it and its slot goes to the next URL; the URL
+    counts as done once the stage is done with it. The stage is closed
+    on return.
 
-        for line in process.stdout:
-            print(line, end="")
+    A failed URL is tried again up to ``retries`` times, after a backoff
+    that doubles each time. Every attempt and its outcome is recorded in
+    ``journal``; a download cut short by Ctrl-C stays "running" there, so
+    resuming starts it again.
+    """
+    engine = engine or SubprocessEngine()
+    children = engine.children
+    total = len(urls)
+    renderer = ProgressRenderer()
+    results = [None] * total
+    outcomes = [None] * total
+    infos = {}
+    prefetcher = None
+    if prefetch:
+        prefetcher = InfoPrefetcher(urls, engine, jobs, batch_size, info_args,
+                                    cache=cache, refresh=refresh)
+    # Saved media URLs expire; older info files are not handed to yt-dlp
+    fresh_until = time.monotonic() + INFO_JSON_MAX_AGE
+    prefetched = {}
+    if prefetcher and order != "input":
+        try:
+            for url in urls:
+                prefetched[url] = prefetcher.get(url)
+        except KeyboardInterrupt:
+            children.cancel()
+            prefetcher.close()
+            raise
+        urls = order_urls(urls, {url: estimate_size(info)
+                                 for url, (info, _) in prefetched.items()}, order)
+    converts = "-x" in cmd or isinstance(stage, TranscodePool)
 
-        process.wait()
-        return process.returncode == 0
+    def peak_size(info: dict):
+        """The most disk a download of ``info`` takes at once, if known."""
+        size = estimate_size(info)
+        if not size or "--skip-download" in cmd:
+            return None
+        if converts or len(info.get("requested_formats") or ()) > 1:
+            size *= DISK_RESERVE_FACTOR
+        return size
 
+    scheduler = HostScheduler(jobs, host_rate, adaptive, disk)
+    for i, url in enumerate(urls, 1):
+        task = DownloadTask(i, url)
+        if url in prefetched:
+            infos[i] = prefetched[url]
+            task.size = peak_size(infos[i][0])
+        scheduler.add(task)
+
+    def staged(i: int, url: str, prefix: str, future):
+        if future.cancelled() or children.cancelled.is_set():
+            return
+        error = future.exception()
+        result = results[i - 1]
+        if error is None:
+            result["phases"][stage.phase] = round(future.result(), 3)
+            emit("✓ Complete", prefix)
+        else:
+            result["ok"] = False
+            result["error"] = f"ERROR: {stage.phase} failed: {error}"
+            emit(f"✗ {stage.phase.capitalize()} failed: {error}", prefix)
+        if journal:
+            journal.record(url, "done" if error is None else "failed",
+                           **({} if error is None else {"error": result["error"]}))
+        outcomes[i - 1] = error is None
+
+    def attempt(task: DownloadTask) -> tuple:
+        """Run one attempt; returns (ok, throttled, seconds until retry or None)."""
+        i, url = task.index, task.url
+        prefix = f"[{i}/{total}] " if jobs > 1 else ""
+        if task.attempt == 1 and not task.deferred:
+            if jobs > 1:
+                emit(f"Processing {url}", prefix)
+            else:
+                emit(f"\n[{i}/{total}] Processing...")
+            if i not in infos:
+                infos[i] = prefetcher.get(url) if prefetcher else (None, None)
+        if task.no_room:
+            emit(f"✗ Not enough disk space: {task.no_room}", prefix)
+            if journal:
+                journal.record(url, "failed", error=f"Not enough disk space: {task.no_room}")
+            outcomes[i - 1] = False
+            return False, False, None
+        info, info_path = infos.pop(i, (None, None))
+        if info_path and time.monotonic() > fresh_until:
+            info_path.unlink(missing_ok=True)
+            info_path = None
+        if task.size is None:
+            # From now on the disk budget reserves room for it
+            task.size = peak_size(info)
+            if task.size and scheduler.over_budget(task):
+                # Back to the queue, where the budget holds it or gives up
+                infos[i] = (info, info_path)
+                task.deferred = True
+                task.attempt -= 1
+                return False, False, 0.0
+        if entries and url in entries:
+            info = entries[url]
+            fd, name = tempfile.mkstemp(prefix="huginn-entry-", suffix=".info.json")
+            with os.fdopen(fd, "w", encoding="utf-8") as f:
+                json.dump(info, f)
+            info_path = Path(name)
+        if journal:
+            journal.record(url, "running")
+        monitor = task.monitor = DownloadMonitor(url, prefix, renderer, events)
+        try:
+            ok = download_url(url, cmd, show_info=(task.attempt == 1), prefix=prefix,
+                              engine=engine, info=info, info_path=info_path,
+                              monitor=monitor)
+        finally:
+            # Retries extract afresh: the saved media URLs may be what failed
+            if info_path:
+                info_path.unlink(missing_ok=True)
+        results[i - 1] = monitor.summary()
+        if children.cancelled.is_set():
+            return False, False, None
+        future = stage.submit(monitor) if ok and stage else None
+        if future:
+            if not future.done():
+                emit(f"✓ Downloaded, {stage.action}", prefix)
+            future.add_done_callback(
+                lambda future, i=i, url=url, prefix=prefix: staged(i, url, prefix, future))
+            return True, bool(monitor.throttled), None
+        if journal:
+            journal.record(url, "done" if ok else "failed",
+                           **({} if ok else {"error": monitor.error}))
+        if ok:
+            emit("✓ Complete", prefix)
+        elif (scheduler.adaptive and monitor.throttled
+              and task.throttled < THROTTLED_RETRIES):
+            # Not the URL's fault: try again once the host's pause is over
+            task.throttled += 1
+            emit("✗ Throttled, retrying when the site allows", prefix)
+            return False, True, 0.0
+        elif (task.attempt - task.throttled > retries
+              or PERMANENT_ERROR.search(monitor.error or "")):
+            emit("✗ Failed", prefix)
+        else:
+            tries = task.attempt - task.throttled
+            delay = RETRY_BACKOFF * 2 ** (tries - 1)
+            emit(f"✗ Failed, retrying in {delay:.0f}s ({tries}/{retries})", prefix)
+            return False, bool(monitor.throttled), delay
+        outcomes[i - 1] = ok
+        return ok, bool(monitor.throttled), None
+
+    def worker():
+        while True:
+            task = scheduler.next()
+            if task is None:
+                return
+            ok, throttled, retry_in = False, False, None
+            try:
+                ok, throttled, retry_in = attempt(task)
+            except Exception as e:
+                emit(f"Error: {e}")
+                outcomes[task.index - 1] = False
+            finally:
+                note = scheduler.finish(task, ok, throttled, retry_in)
+            if note:
+                emit(note)
+
+    executor = ThreadPoolExecutor(max_workers=jobs)
+    try:
+        for future in [executor.submit(worker) for _ in range(jobs)]:
+            future.result()
     except KeyboardInterrupt:
-        print("\n\nDownload cancelled by user.")
-        process.terminate()
-        return False
+        emit("\n\nDownload cancelled by user.")
+        scheduler.cancel()
+        children.cancel()
+        raise
+    finally:
+        scheduler.cancel()
+        executor.shutdown(wait=True)
+        if stage:
+            stage.close(cancel=children.cancelled.is_set())
+        if prefetcher:
+            prefetcher.close()
+
+    success = outcomes.count(True)
+    failed = outcomes.count(False)
+    return success, failed, [result for result in results if result]
 
 
 def main():
@@ -207,6 +1962,12 @@ def main():
     # Audio
     parser.add_argument("--audio", "-a", nargs="?", const="mp3",
                         help="Audio only (mp3, m4a, flac, wav, opus)")
+    parser.add_argument("--pipeline", action="store_true",
+                        help="With --audio, convert with ffmpeg on a separate pool "
+                             "while the next downloads run")
+    parser.add_argument("--transcode-jobs", type=int, metavar="N",
+                        help="Conversions to run at once with --pipeline "
+                             "(default: one per CPU core)")
 
     # Format
     parser.add_argument("--format", choices=["mp4", "webm", "mkv"],
@@ -228,20 +1989,105 @@ def main():
     # Extras
     parser.add_argument("--subs", nargs="?", const=True,
                         help="Download subtitles (optional: language code)")
+    parser.add_argument("--auto-subs", action="store_true",
+                        help="Also take auto-generated subtitles")
+    parser.add_argument("--subs-only", action="store_true",
+                        help="Fetch subtitles without the media and write a "
+                             "deduplicated transcript of each")
+    parser.add_argument("--transcript-format", choices=OUTPUT_FORMATS, default="txt",
+                        help="Transcript format with --subs-only (default: txt)")
     parser.add_argument("--thumb", action="store_true", help="Download thumbnail")
     parser.add_argument("--meta", action="store_true", help="Embed metadata")
     parser.add_argument("--proxy", help="Proxy URL for geo-restricted content")
 
+    # Concurrency
+    parser.add_argument("--jobs", "-j", type=int, default=1,
+                        help="Downloads to run at once (default: 1)")
+    parser.add_argument("--batch-size", type=int, default=PREFETCH_BATCH,
+                        help=f"URLs per metadata prefetch run (default: {PREFETCH_BATCH})")
+    parser.add_argument("--engine", choices=ENGINES, default="auto",
+                        help="Run yt-dlp in this process (embedded) or as a command "
+                             "per URL (subprocess); auto embeds it when the yt_dlp "
+                             "module is installed (default: auto)")
+    parser.add_argument("--host-rate", type=float, metavar="N",
+                        help="Start at most N downloads a second per site "
+                             "(default: no limit; halved while a site throttles)")
+    parser.add_argument("--order", choices=list(ORDERS), default="input",
+                        help="Download order by estimated size: as given (input), "
+                             "smallest first to finish the most URLs soonest "
+                             "(shortest) or largest first (default: input)")
+    parser.add_argument("--min-free", type=parse_size, metavar="SIZE",
+                        help="Hold new downloads while they would leave less than "
+                             "SIZE free on the output volume (e.g. 500M; default: "
+                             "no limit, or 0 with a size --order)")
+    parser.add_argument("--dry-run", action="store_true",
+                        help="Show the planned order and projected disk use, "
+                             "then exit")
+    parser.add_argument("--retries", type=int, default=DEFAULT_RETRIES,
+                        help="Times to retry a failed URL, with growing pauses "
+                             f"(default: {DEFAULT_RETRIES})")
+    parser.add_argument("--events", metavar="FILE",
+                        help="Append progress events (bytes, speed, ETA, phase) "
+                             "to FILE as JSON lines")
+
     # Info only
     parser.add_argument("--info", action="store_true", help="Show info without downloading")
 
+    # Batch journal
+    parser.add_argument("--journal", metavar="FILE",
+                        help="Record every URL's progress in FILE "
+                             "(default with --file: <file>.journal)")
+    parser.add_argument("--resume", action="store_true",
+                        help="Continue the run recorded in the journal, skipping "
+                             "URLs that are done")
+
+    # Metadata cache
+    parser.add_argument("--refresh", action="store_true",
+                        help="Ignore cached metadata and fetch it again")
+    parser.add_argument("--no-cache", action="store_true",
+                        help="Don't read or write the metadata cache")
+    parser.add_argument("--cache-ttl", type=float, metavar="HOURS",
+                        default=DEFAULT_CACHE_TTL / 3600,
+                        help="How long cached metadata stays valid (default: %(default)g)")
+    parser.add_argument("--import-info", metavar="FILE",
+                        help="Load recorded yt-dlp --dump-json output into the "
+                             "metadata cache (e.g. for offline use)")
+
     args = parser.parse_args()
 
     # Validate input
-    if not args.url and not args.file:
+    if not args.url and not args.file and not args.import_info:
         parser.error("Please provide a URL or --file with URLs")
+    if args.pipeline and not args.audio:
+        parser.error("--pipeline needs --audio")
+    if args.subs_only and args.audio:
+        parser.error("--subs-only doesn't combine with --audio")
+    if args.pipeline and not shutil.which("ffmpeg"):
+        parser.error("--pipeline needs ffmpeg")
+    if args.pipeline and args.meta:
+        # Embedding has to happen after the conversion, inside yt-dlp
+        print("Warning: --meta converts inline; ignoring --pipeline")
+        args.pipeline = False
 
-    check_dependencies()
+    cache = None
+    if not args.no_cache:
+        cache = MetadataCache(default_cache_path(), ttl=args.cache_ttl * 3600)
+
+    if args.import_info:
+        if cache is None:
+            parser.error("--import-info needs the metadata cache")
+        count = cache.import_file(Path(args.import_info))
+        print(f"Imported {count} entries into {default_cache_path()}")
+        if not args.url and not args.file:
+            cache.close()
+            sys.exit(0)
+
+    try:
+        engine = make_engine(args.engine)
+    except ImportError:
+        print("Error: --engine embedded needs the yt_dlp module (pip install yt-dlp)")
+        sys.exit(1)
+    check_dependencies(engine)
 
     # Build base command
     cmd = build_command(args)
@@ -261,16 +2107,93 @@ def main():
         print("No URLs to process.")
         sys.exit(0)
 
+    # Canonical URLs only, without duplicates or archived videos: nothing
+    # is extracted or started for the ones left out
+    archive = None
+    if args.archive and not args.info:
+        archive = load_archive(archive_path(args))
+    urls, skipped = prepare_urls(urls, archive, cache)
+
+    # Metadata probes go through the same proxy as downloads, and pick
+    # the same formats so size estimates match
+    info_args = ["--proxy", args.proxy] if args.proxy else []
+    info_args += format_selection(cmd)
+
     # Info only mode
     if args.info:
-        for url in urls:
-            info = get_video_info(url)
-            if info:
-                print(f"\nTitle: {info.get('title', 'Unknown')}")
-                print(f"Duration: {info.get('duration_string', 'Unknown')}")
-                print(f"Uploader: {info.get('uploader', 'Unknown')}")
-                print(f"Est. size: {format_size(info.get('filesize_approx', 0))}")
-                print(f"URL: {url}")
+        try:
+            with InfoPrefetcher(urls, engine, max(1, args.jobs),
+                                args.batch_size, info_args, save=False,
+                                cache=cache, refresh=args.refresh) as prefetcher:
+                for url in urls:
+                    show_info(url, prefetcher.get(url)[0])
+        except KeyboardInterrupt:
+            sys.exit(130)
+        finally:
+            engine.close()
+            if cache:
+                cache.close()
+        sys.exit(0)
+
+    # Playlists and channels are listed up front, so their videos can be
+    # spread over the workers like any other URLs
+    entries = None
+    playlists = 0
+    if args.playlist or args.channel:
+        playlists = len(urls)
+        range_args = ["--playlist-items", args.range] if args.range else []
+        print(f"Listing {playlists} playlist{'s' if playlists != 1 else ''}...")
+        try:
+            urls, entries = expand_playlists(urls, engine, info_args + range_args,
+                                             max(1, args.jobs))
+        except KeyboardInterrupt:
+            engine.children.cancel()
+            engine.close()
+            sys.exit(130)
+        urls, left_out = prepare_urls(urls, archive, cache)
+        skipped.update(left_out)
+
+    output_dir = Path(args.output).resolve() if args.output else Path.cwd()
+    # Without --min-free or a size order, downloads start regardless of space
+    disk = None
+    if args.min_free is not None or args.order != "input":
+        disk = DiskBudget(output_dir, args.min_free or 0)
+
+    if args.dry_run:
+        try:
+            with InfoPrefetcher(urls, engine, max(1, args.jobs),
+                                args.batch_size, info_args, save=False,
+                                cache=cache, refresh=args.refresh) as prefetcher:
+                infos = {url: prefetcher.get(url)[0] for url in urls}
+        except KeyboardInterrupt:
+            sys.exit(130)
+        finally:
+            engine.close()
+            if cache:
+                cache.close()
+        print_plan(urls, infos, args.order, disk or DiskBudget(output_dir))
+        sys.exit(0)
+
+    # The journal says which URLs an earlier run finished; those are
+    # dropped here, before anything is started for them
+    journal = None
+    journal_path = args.journal or (f"{args.file}.journal" if args.file else None)
+    if args.resume and not journal_path:
+        parser.error("--resume needs --file or --journal")
+    if journal_path:
+        journal = Journal(Path(journal_path), resume=args.resume)
+        remaining = [url for url in urls if journal.state(url) != "done"]
+        if len(remaining) < len(urls):
+            skipped["done"] = len(urls) - len(remaining)
+        urls = remaining
+        journal.add(urls)
+    if not urls:
+        if journal:
+            journal.close()
+        engine.close()
+        if cache:
+            cache.close()
+        print(f"Nothing to do. Skipped: {format_skipped(skipped)}")
         sys.exit(0)
 
     # Download
@@ -278,28 +2201,71 @@ def main():
     print(f"YouTube Downloader")
     print(f"{'='*50}")
     print(f"URLs to process: {len(urls)}")
+    if entries:
+        print(f"Playlist videos: {len(entries)} (from {playlists} playlist"
+              f"{'s' if playlists != 1 else ''})")
+    if skipped:
+        print(f"Skipped: {format_skipped(skipped)}")
     print(f"Quality: {args.quality or 'best'}")
+    print(f"Engine: {engine.name}")
+    if args.jobs > 1:
+        print(f"Parallel jobs: {args.jobs}")
+    if args.pipeline:
+        print(f"Conversions: {args.transcode_jobs or os.cpu_count() or 1} at a time")
+    if args.order != "input":
+        print(f"Order: {ORDERS[args.order]}")
     print(f"Output: {args.output or 'current directory'}")
     print(f"{'='*50}")
 
-    success = 0
-    failed = 0
-
-    for i, url in enumerate(urls, 1):
-        print(f"\n[{i}/{len(urls)}] Processing...")
-        if download_url(url, cmd, show_info=True):
-            success += 1
-            print("✓ Complete")
-        else:
-            failed += 1
-            print("✗ Failed")
+    events = EventLog(Path(args.events)) if args.events else None
+    stage = None
+    if args.pipeline:
+        stage = TranscodePool(audio_format(args.audio), engine.children, args.transcode_jobs)
+    elif args.subs_only:
+        stage = TranscriptWriter(args.transcript_format)
+    started = time.monotonic()
+    try:
+        # Playlist videos download from their flat entries: the full info
+        # of the bare video would lose their place in the playlist
+        prefetch = not (args.playlist or args.channel)
+        success, failed, results = run_downloads(
+            urls, cmd, max(1, args.jobs), prefetch, args.batch_size, info_args,
+            cache, args.refresh, engine, events, journal, max(0, args.retries),
+            args.host_rate, entries=entries, stage=stage, order=args.order,
+            disk=disk)
+    except KeyboardInterrupt:
+        if journal:
+            print(f"Resume with --resume (journal: {journal_path})")
+        sys.exit(130)
+    finally:
+        engine.close()
+        if journal:
+            journal.close()
+        if events:
+            events.close()
+        if cache:
+            cache.close()
 
     # Summary
     print(f"\n{'='*50}")
     print(f"Download Summary")
     print(f"{'='*50}")
+    for result in results:
+        print(f"{'✓' if result['ok'] else '✗'} {result['url']}")
+        print(f"   {format_result(result)}")
+    if results:
+        print(f"{'-'*50}")
     print(f"Success: {success}")
     print(f"Failed: {failed}")
+    if args.subs_only:
+        elapsed = time.monotonic() - started
+        print(f"Transcripts: {success} in {elapsed:.1f}s "
+              f"({60 * success / max(elapsed, 1e-9):.1f} videos/min)")
+    if skipped:
+        print(f"Skipped: {format_skipped(skipped)}")
+    transferred = sum(result["bytes"] for result in results)
+    if transferred:
+        print(f"Downloaded: {format_size(transferred)}")
     print(f"Output: {args.output or Path.cwd()}")
     print(f"{'='*50}\n")
 
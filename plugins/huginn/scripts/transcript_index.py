@@ -0,0 +1,337 @@
+#!/usr/bin/env python3
+"""
+Transcript Search Index
+
+Keeps a full-text inverted index over a corpus of transcripts, so "which
+videos mention X, and when" is answered from the index instead of by
+grepping every file. The index is a single SQLite file: for every term it
+holds, per transcript, the packed numbers of the segments the term occurs
+in, and each segment keeps the start time dedupe.py gave it.
+
+Indexed files:
+    .jsonl  transcripts from dedupe.py --format=jsonl (directories add these)
+    .txt    transcripts from dedupe.py --timestamps
+    .vtt    raw captions, deduplicated on the fly
+    .srt    raw captions, deduplicated on the fly
+
+Adding is incremental: unchanged files are skipped and changed ones are
+re-indexed. Queries rank matching segments with BM25.
+
+Usage:
+    python transcript_index.py add transcripts/ --db transcripts.db
+    python transcript_index.py add new/*.jsonl --prune
+    python transcript_index.py query "borrow checker" --limit 5
+    python transcript_index.py query "async* rust" --any --format=jsonl
+"""
+
+import os
+import re
+import sys
+import json
+import math
+import heapq
+import sqlite3
+import argparse
+from array import array
+from collections import Counter, defaultdict
+from itertools import repeat
+from pathlib import Path
+from typing import Optional
+
+from dedupe import CAPTION_SUFFIXES, expand_inputs, format_clock, iter_captions, timestamp_to_ms
+
+
+DEFAULT_DB = 'transcripts.db'
+
+TERM_PATTERN = re.compile(r'\w+')
+TIMESTAMPED_LINE = re.compile(r'\[((?:\d+:)?\d{2}:\d{2})\] (.*)')
+
+# BM25 term-frequency saturation and length normalization
+BM25_K1 = 1.2
+BM25_B = 0.75
+SNIPPET_CHARS = 160
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS files (
+    id INTEGER PRIMARY KEY,
+    path TEXT NOT NULL UNIQUE,
+    mtime_ns INTEGER NOT NULL,
+    size INTEGER NOT NULL,
+    words INTEGER NOT NULL,
+    lengths BLOB NOT NULL
+);
+CREATE TABLE IF NOT EXISTS segments (
+    file_id INTEGER NOT NULL,
+    seq INTEGER NOT NULL,
+    start_ms INTEGER NOT NULL,
+    text TEXT NOT NULL,
+    PRIMARY KEY (file_id, seq)
+) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS postings (
+    term TEXT NOT NULL,
+    file_id INTEGER NOT NULL,
+    seqs BLOB NOT NULL,
+    PRIMARY KEY (term, file_id)
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS postings_file ON postings (file_id);
+"""
+
+
+def tokenize(text: str) -> list[str]:
+    """Split text into case-folded word terms."""
+    return TERM_PATTERN.findall(text.casefold())
+
+
+def read_segments(path: Path):
+    """Yield (start_ms, text) segments from a transcript or caption file."""
+    suffix = path.suffix.lower()
+    if suffix == '.jsonl':
+        with open(path, encoding='utf-8') as f:
+            for line in f:
+                if line.strip():
+                    segment = json.loads(line)
+                    yield segment['start_ms'], segment['text']
+    elif suffix == '.txt':
+        with open(path, encoding='utf-8') as f:
+            for number, line in enumerate(f, 1):
+                if not line.strip():
+                    continue
+                match = TIMESTAMPED_LINE.fullmatch(line.rstrip('\n'))
+                if not match:
+                    raise ValueError(f"{path}:{number}: no [HH:MM:SS] timestamp "
+                                     f"(write transcripts with dedupe.py --timestamps)")
+                yield timestamp_to_ms(match.group(1)), match.group(2)
+    elif suffix in CAPTION_SUFFIXES:
+        with open(path, 'rb') as f:
+            for start, _, text in iter_captions(f):
+                yield start, text
+    else:
+        raise ValueError(f"Unsupported transcript type: {path}")
+
+
+def snippet(text: str, terms: list[str], width: int = SNIPPET_CHARS) -> str:
+    """Cut ``text`` down to ``width`` characters around the first matching term."""
+    if len(text) <= width:
+        return text
+    folded = text.casefold()
+    first = min((i for i in (folded.find(term) for term in terms) if i >= 0), default=0)
+    start = max(0, min(first - width // 3, len(text) - width))
+    cut = text[start:start + width]
+    return f"{'…' if start else ''}{cut}{'…' if start + width < len(text) else ''}"
+
+
+class SearchIndex:
+    """Inverted index of transcript segments stored in SQLite."""
+
+    def __init__(self, path: Path):
+        self.db = sqlite3.connect(path)
+        # Each added file commits on its own; WAL keeps that from costing
+        # an fsync apiece
+        self.db.execute('PRAGMA journal_mode = WAL')
+        self.db.execute('PRAGMA synchronous = NORMAL')
+        self.db.executescript(SCHEMA)
+
+    def close(self):
+        self.db.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def add(self, path: Path) -> Optional[int]:
+        """
+        Index ``path``, replacing any older version of it. Returns the number
+        of segments indexed, or None if the file is unchanged since last time.
+        """
+        key = str(path.resolve())
+        stat = path.stat()
+        row = self.db.execute('SELECT id, mtime_ns, size FROM files WHERE path = ?',
+                              (key,)).fetchone()
+        if row and row[1:] == (stat.st_mtime_ns, stat.st_size):
+            return None
+
+        # Read everything before touching the index, so a bad file
+        # leaves the previous version in place
+        segments = []
+        lengths = array('I')
+        postings = defaultdict(lambda: array('I'))
+        for seq, (start, text) in enumerate(read_segments(path)):
+            terms = tokenize(text)
+            lengths.append(len(terms))
+            for term in terms:
+                postings[term].append(seq)
+            segments.append((seq, start, text))
+
+        with self.db:
+            if row:
+                self._delete(row[0])
+            file_id = self.db.execute(
+                'INSERT INTO files (path, mtime_ns, size, words, lengths) '
+                'VALUES (?, ?, ?, ?, ?)',
+                (key, stat.st_mtime_ns, stat.st_size, sum(lengths), lengths.tobytes())
+            ).lastrowid
+            self.db.executemany(
+                'INSERT INTO segments (file_id, seq, start_ms, text) VALUES (?, ?, ?, ?)',
+                ((file_id, *segment) for segment in segments))
+            self.db.executemany(
+                'INSERT INTO postings (term, file_id, seqs) VALUES (?, ?, ?)',
+                ((term, file_id, seqs.tobytes()) for term, seqs in postings.items()))
+        return len(segments)
+
+    def prune(self) -> list[str]:
+        """Drop files that no longer exist on disk; returns their paths."""
+        gone = [(file_id, path) for file_id, path in
+                self.db.execute('SELECT id, path FROM files')
+                if not os.path.exists(path)]
+        with self.db:
+            for file_id, _ in gone:
+                self._delete(file_id)
+        return [path for _, path in gone]
+
+    def _delete(self, file_id: int):
+        self.db.execute('DELETE FROM postings WHERE file_id = ?', (file_id,))
+        self.db.execute('DELETE FROM segments WHERE file_id = ?', (file_id,))
+        self.db.execute('DELETE FROM files WHERE id = ?', (file_id,))
+
+    def _occurrences(self, term: str) -> Counter:
+        """Count a term's (or a ``prefix*``'s) occurrences per (file_id, seq)."""
+        if term.endswith('*'):
+            prefix = term[:-1]
+            rows = self.db.execute(
+                'SELECT file_id, seqs FROM postings WHERE term >= ? AND term < ?',
+                (prefix, prefix + '\U0010ffff'))
+        else:
+            rows = self.db.execute('SELECT file_id, seqs FROM postings WHERE term = ?',
+                                   (term,))
+        counts = Counter()
+        for file_id, blob in rows:
+            seqs = array('I')
+            seqs.frombytes(blob)
+            counts.update(zip(repeat(file_id), seqs))
+        return counts
+
+    def query(self, text: str, limit: int = 10, any_term: bool = False) -> list[dict]:
+        """
+        Return the best ``limit`` segments for ``text``, ranked by BM25.
+
+        Every term must occur in a segment unless ``any_term`` is set; a
+        trailing ``*`` matches all terms with that prefix.
+        """
+        terms = [term + '*' if word.endswith('*') else term
+                 for word in text.split() for term in tokenize(word)]
+        if not terms:
+            return []
+        segment_count, word_count = self.db.execute(
+            'SELECT COALESCE(SUM(LENGTH(lengths)), 0) / 4, COALESCE(SUM(words), 0) '
+            'FROM files').fetchone()
+        if not segment_count:
+            return []
+        average = word_count / segment_count
+
+        matches = [self._occurrences(term) for term in dict.fromkeys(terms)]
+        if any_term:
+            candidates = set().union(*matches)
+        else:
+            candidates = set(min(matches, key=len))
+            for counts in matches:
+                candidates.intersection_update(counts)
+        if not candidates:
+            return []
+
+        lengths = {}
+        for file_id in {file_id for file_id, _ in candidates}:
+            blob, = self.db.execute('SELECT lengths FROM files WHERE id = ?',
+                                    (file_id,)).fetchone()
+            lengths[file_id] = array('I')
+            lengths[file_id].frombytes(blob)
+
+        weights = [math.log(1 + (segment_count - len(counts) + 0.5) / (len(counts) + 0.5))
+                   for counts in matches]
+        scores = {}
+        for candidate in candidates:
+            file_id, seq = candidate
+            norm = BM25_K1 * (1 - BM25_B + BM25_B * lengths[file_id][seq] / average)
+            score = 0.0
+            for weight, counts in zip(weights, matches):
+                tf = counts.get(candidate)
+                if tf:
+                    score += weight * tf * (BM25_K1 + 1) / (tf + norm)
+            scores[candidate] = score
+
+        # Ties go to the older file and the earlier segment
+        best = heapq.nlargest(limit, scores,
+                              key=lambda c: (scores[c], -c[0], -c[1]))
+        plain = [term.rstrip('*') for term in terms]
+        hits = []
+        for file_id, seq in best:
+            path, start, segment = self.db.execute(
+                'SELECT f.path, s.start_ms, s.text FROM segments s '
+                'JOIN files f ON f.id = s.file_id WHERE s.file_id = ? AND s.seq = ?',
+                (file_id, seq)).fetchone()
+            hits.append({'path': path, 'start_ms': start,
+                         'score': round(scores[file_id, seq], 4),
+                         'text': snippet(segment, plain)})
+        return hits
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description='Full-text search over deduplicated transcripts'
+    )
+    parser.add_argument('--db', type=Path,
+                        default=os.environ.get('HUGINN_INDEX', DEFAULT_DB),
+                        help='Index file (default: $HUGINN_INDEX or %(default)s)')
+    commands = parser.add_subparsers(dest='command', required=True)
+
+    add = commands.add_parser('add', help='Index new or changed transcripts')
+    add.add_argument('input', nargs='+',
+                     help='Transcript files, directories (their .jsonl files) '
+                          'or glob patterns')
+    add.add_argument('--prune', action='store_true',
+                     help='Also drop indexed files that no longer exist')
+
+    query = commands.add_parser('query', help='Search the index')
+    query.add_argument('terms', help='Words to look for; word* matches a prefix')
+    query.add_argument('--limit', '-n', type=int, default=10,
+                       help='Number of hits (default: %(default)s)')
+    query.add_argument('--any', action='store_true',
+                       help='Match segments with any of the terms, not all')
+    query.add_argument('--format', '-f', choices=['txt', 'jsonl'], default='txt',
+                       help='Output format (default: txt)')
+
+    args = parser.parse_args()
+
+    with SearchIndex(args.db) as index:
+        if args.command == 'query':
+            for hit in index.query(args.terms, args.limit, args.any):
+                if args.format == 'jsonl':
+                    print(json.dumps(hit))
+                else:
+                    print(f"{hit['path']} [{format_clock(hit['start_ms'])}] {hit['text']}")
+            return
+
+        failed = 0
+        added = unchanged = 0
+        for path in expand_inputs(args.input, suffixes={'.jsonl'}):
+            try:
+                count = index.add(path)
+            except (OSError, ValueError, KeyError) as e:
+                failed += 1
+                print(f"✗ {path}: {e}", file=sys.stderr)
+                continue
+            if count is None:
+                unchanged += 1
+            else:
+                added += 1
+                print(f"✓ {path} ({count} segments)")
+        pruned = index.prune() if args.prune else []
+        print(f"\nIndexed {added}, unchanged {unchanged}, failed {failed}"
+              + (f", pruned {len(pruned)}" if args.prune else ''))
+        if failed:
+            sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,141 @@
+#!/usr/bin/env python3
+"""
+Transcript Range Reader
+
+Reads the lines of a jsonl transcript written by ``dedupe.py --format=jsonl``
+that fall within a time range. The sidecar ``.idx`` file is binary-searched
+for the first line ending after the range start, so only the bytes of the
+requested range are read, however long the transcript is.
+
+Usage:
+    python transcript_range.py transcript.jsonl 01:12:00 01:15:00
+    python transcript_range.py transcript.jsonl 01:12:00 01:15:00 --mmap --format=jsonl
+"""
+
+import sys
+import json
+import mmap
+import argparse
+from pathlib import Path
+
+from dedupe import INDEX_HEADER, INDEX_MAGIC, INDEX_SUFFIX, format_clock, timestamp_to_ms
+
+
+def parse_time(value: str) -> int:
+    """Parse HH:MM:SS[.mmm], MM:SS[.mmm] or plain seconds into milliseconds."""
+    if ':' not in value:
+        return int(float(value) * 1000)
+    if value.count(':') == 1:
+        value = f"00:{value}"
+    return timestamp_to_ms(value)
+
+
+class TranscriptIndex:
+    """Memory-mapped view of a jsonl transcript's seek index."""
+
+    def __init__(self, path: Path):
+        self._file = open(path, 'rb')
+        try:
+            self._map = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+        except ValueError:
+            # mmap refuses empty files; an index is never shorter than its header
+            self._file.close()
+            raise ValueError(f"Not a transcript index: {path}")
+        magic, self.count = INDEX_HEADER.unpack_from(self._map)
+        if magic != INDEX_MAGIC:
+            self.close()
+            raise ValueError(f"Not a transcript index: {path}")
+        self._entries = memoryview(self._map)[INDEX_HEADER.size:].cast('q')
+
+    def offset_for(self, start_ms: int) -> int:
+        """Byte offset of the first line that ends after ``start_ms``."""
+        lo, hi = 0, self.count
+        while lo < hi:
+            mid = (lo + hi) // 2
+            if self._entries[2 * mid] <= start_ms:
+                lo = mid + 1
+            else:
+                hi = mid
+        return self._entries[2 * lo + 1] if lo < self.count else -1
+
+    def close(self):
+        self._entries = None
+        self._map.close()
+        self._file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+def _lines_from(path: Path, offset: int, use_mmap: bool):
+    """Yield raw lines of ``path`` starting at byte ``offset``."""
+    with open(path, 'rb') as f:
+        if not use_mmap:
+            f.seek(offset)
+            yield from f
+            return
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+            pos = offset
+            while pos < len(mm):
+                end = mm.find(b'\n', pos)
+                end = len(mm) if end < 0 else end + 1
+                yield mm[pos:end]
+                pos = end
+
+
+def read_range(transcript: Path, start_ms: int, end_ms: int,
+               index_path: Path = None, use_mmap: bool = False):
+    """
+    Yield (start_ms, end_ms, text) for the lines overlapping the range.
+
+    Reading stops at the first line starting after ``end_ms``, so a query
+    touches O(log n) index entries plus the lines it returns.
+    """
+    index_path = index_path or transcript.with_name(transcript.name + INDEX_SUFFIX)
+    with TranscriptIndex(index_path) as index:
+        offset = index.offset_for(start_ms)
+    if offset < 0:
+        return
+
+    for line in _lines_from(transcript, offset, use_mmap):
+        segment = json.loads(line)
+        if segment['start_ms'] > end_ms:
+            break
+        if segment['end_ms'] > start_ms:
+            yield segment['start_ms'], segment['end_ms'], segment['text']
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description='Read a time range from an indexed jsonl transcript'
+    )
+    parser.add_argument('transcript', type=Path, help='jsonl transcript from dedupe.py')
+    parser.add_argument('start', help='Range start (HH:MM:SS, MM:SS or seconds)')
+    parser.add_argument('end', help='Range end (HH:MM:SS, MM:SS or seconds)')
+    parser.add_argument('--index', type=Path,
+                        help=f'Seek index (default: <transcript>{INDEX_SUFFIX})')
+    parser.add_argument('--mmap', action='store_true',
+                        help='Read the transcript through mmap')
+    parser.add_argument('--format', '-f', choices=['txt', 'jsonl'], default='txt',
+                        help='Output format (default: txt with timestamps)')
+
+    args = parser.parse_args()
+
+    try:
+        segments = read_range(args.transcript, parse_time(args.start),
+                              parse_time(args.end), args.index, args.mmap)
+        for start, end, text in segments:
+            if args.format == 'jsonl':
+                print(json.dumps({'start_ms': start, 'end_ms': end, 'text': text}))
+            else:
+                print(f"[{format_clock(start)}] {text}")
+    except (OSError, ValueError) as e:
+        print(f"Error: {e}", file=sys.stderr)
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
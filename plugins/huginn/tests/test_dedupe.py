@@ -0,0 +1,291 @@
+"""
+Tests for dedupe.py's cue lexer, cleaning, seen-stores and overlap merging.
+
+The fast paths (whole-block lexing, batched cleaning and timestamp
+conversion, the overlap engine's string checks) must agree with the
+straightforward versions they replace, and the fingerprint seen-store
+must behave like a set.
+
+Run with: python -m pytest plugins/huginn/tests
+"""
+
+import io
+import random
+import sys
+from pathlib import Path
+
+import pytest
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / 'scripts'))
+
+import dedupe  # noqa: E402
+import bench_dedupe  # noqa: E402
+
+
+VTT = """WEBVTT
+Kind: captions
+Language: en
+
+NOTE a comment block
+that spans two lines --> and has an arrow
+
+00:00:01.000 --> 00:00:03.500 align:start position:0%
+<font color="#E5E5E5">hello</font> <00:00:01.500><c> world</c>
+
+intro
+00:00:03.500 --> 00:00:05.000
+fish &amp; chips &#39;n&#39; <b>bold
+move</b> on
+
+00:00:05.000 --> 00:00:06.000
+the arrow --> stays in the text
+00:00:06.000 --> 00:00:07.000
+a timing line inside cue text
+
+00:00:07.000 --> 00:00:08.000
+
+00:00:08.000 --> 00:00:09.000
+   \t
+
+01:02:03.004 --> 01:02:04.005
+<i
+>tag over a line break</i>
+"""
+
+SRT = """1\r
+00:00:01,000 --> 00:00:02,000\r
+crlf &gt;&gt; line\r
+\r
+2\r
+00:00:02,000 --> 00:00:03,250\r
+two\r
+lines\r
+\r
+3\r
+100:00:00,000 --> 100:00:01,999\r
+three-digit hours\r
+"""
+
+NUL = """WEBVTT
+
+00:00:01.000 --> 00:00:02.000
+null\0byte <i>in\0side</i> text
+
+00:00:02.000 --> 00:00:03.000
+<b>after</b> it
+"""
+
+FIXTURES = {'vtt': VTT, 'srt': SRT, 'nul': NUL}
+CHUNK_SIZES = [1, 2, 3, 7, 64, 4096]
+
+
+def corpus():
+    """The fixtures plus a short synthetic VTT and SRT from bench_dedupe."""
+    texts = dict(FIXTURES)
+    for fmt, generate in bench_dedupe.GENERATORS.items():
+        out = io.StringIO()
+        generate(out, 0.05, seed=1)
+        texts[f'synthetic.{fmt}'] = out.getvalue()
+    return texts
+
+
+def line_by_line(text: str) -> list:
+    return dedupe.CueParser()._lex_lines(text)
+
+
+def chunked(text: str, size: int) -> list:
+    parser = dedupe.CueParser()
+    cues = []
+    for i in range(0, len(text), size):
+        cues.extend(parser.feed(text[i:i + size]))
+    return cues + parser.close()
+
+
+@pytest.mark.parametrize('name, text', corpus().items())
+def test_block_lexer_matches_line_lexer(name, text):
+    assert dedupe.CueParser()._lex(text) == line_by_line(text)
+
+
+@pytest.mark.parametrize('size', CHUNK_SIZES)
+@pytest.mark.parametrize('name, text', corpus().items())
+def test_chunking_does_not_change_cues(name, text, size):
+    assert chunked(text, size) == line_by_line(text)
+
+
+def test_fixtures_lex_as_expected():
+    assert line_by_line(VTT) == [
+        (1000, 3500, 'hello world'),
+        (3500, 5000, "fish & chips 'n' bold move on"),
+        (5000, 6000, 'the arrow --> stays in the text'),
+        (6000, 7000, 'a timing line inside cue text'),
+        (3723004, 3724005, 'tag over a line break'),
+    ]
+    assert line_by_line(SRT) == [
+        (1000, 2000, 'crlf >> line'),
+        (2000, 3250, 'two lines'),
+        (360000000, 360001999, 'three-digit hours'),
+    ]
+
+
+def test_timestamps_to_ms_matches_timestamp_to_ms():
+    rng = random.Random(0)
+    stamps = ['00:00.000', '59:59,999', '00:00:00.000', '23:59:59.999',
+              '100:00:00,000', '999:59:59.999', '1:02:03.004']
+    for _ in range(1000):
+        hours = rng.choice(['', f'{rng.randrange(100):02d}:', f'{rng.randrange(1000)}:'])
+        separator = rng.choice('.,')
+        stamps.append(f'{hours}{rng.randrange(60):02d}:{rng.randrange(60):02d}'
+                      f'{separator}{rng.randrange(1000):03d}')
+
+    assert dedupe.timestamps_to_ms(stamps) == [dedupe.timestamp_to_ms(s) for s in stamps]
+
+
+def test_clean_lines_matches_clean_line():
+    texts = ['', '  ', 'plain', ' <c>x</c>  y\n z ', '&amp;lt; &#39; &nbsp;end',
+             '<font\ncolor="#fff">multi-line tag</font>', 'a < b > c', 'open <tag',
+             'nul\0inside', '<i>nul\0in tag</i>', '&amp', ' nbsp em']
+    rng = random.Random(0)
+    pieces = ['<', '>', '&', ';', 'amp', '#39', ' ', '\n', '\t', 'word', '<b>', '\0']
+    texts += [''.join(rng.choice(pieces) for _ in range(rng.randrange(12)))
+              for _ in range(2000)]
+
+    assert dedupe.clean_lines(texts) == [dedupe.clean_line(text) for text in texts]
+    for text in texts:
+        assert dedupe.clean_lines([text]) == [dedupe.clean_line(text)]
+
+
+class IntFingerprints(dedupe.FingerprintSeenStore):
+    """Fingerprint store keyed by the fingerprints themselves, to pick the probes."""
+
+    @staticmethod
+    def _fingerprint(key: int) -> int:
+        return key
+
+
+def test_fingerprint_store_wrapping_probes_behave_like_a_set():
+    # Homes 60-63 and 0-1 of a 64-slot table, 4 keys each: probe chains
+    # run past the end of the table and back to the start
+    keys = [home + 64 * k for home in (60, 61, 62, 63, 64, 65) for k in range(4)]
+    rng = random.Random(0)
+    store, expected = IntFingerprints(64), set()
+    for _ in range(20000):
+        key = rng.choice(keys)
+        if rng.random() < 0.5:
+            store.add(key)
+            expected.add(key)
+        else:
+            store.discard(key)
+            expected.discard(key)
+        assert len(store) == len(expected)
+        assert [key in store for key in keys] == [key in expected for key in keys]
+
+
+def test_fingerprint_store_grows_like_a_set():
+    words = [f'line {n}' for n in range(3000)]
+    rng = random.Random(1)
+    store, expected = dedupe.FingerprintSeenStore(8), set()
+    for _ in range(20000):
+        word = rng.choice(words)
+        if rng.random() < 0.7:
+            store.add(word)
+            expected.add(word)
+        else:
+            store.discard(word)
+            expected.discard(word)
+    assert len(store) == len(expected)
+    assert all((word in store) == (word in expected) for word in words)
+
+
+@pytest.mark.parametrize('merge', dedupe.MERGE_ENGINES)
+@pytest.mark.parametrize('name, text', corpus().items())
+def test_hash_seen_store_keeps_exact_output(name, text, merge):
+    exact, _ = dedupe.dedupe_captions(text, True, merge=merge, seen='exact')
+    hashed, _ = dedupe.dedupe_captions(text, True, merge=merge, seen='hash')
+    assert hashed == exact
+
+
+def brute_overlap(window: list, tokens: list) -> int:
+    return max(k for k in range(min(len(window), len(tokens)) + 1)
+               if window[len(window) - k:] == tokens[:k])
+
+
+def reference_merge(cues, max_words: int = dedupe.MAX_SEGMENT_WORDS):
+    """iter_merge_overlaps as its docstring describes it, overlaps by brute force."""
+    seen, pieces, segments = set(), [], []
+    start = end = last = None
+    cut = 0
+    for cue_start, cue_end, text in cues:
+        if last is not None and text.startswith(last):
+            last, end = text, cue_end
+            continue
+        if last is not None:
+            if f' {text} ' in f' {last} ':
+                continue
+            if text in seen:
+                continue
+            line = last[cut:]
+            overlap = brute_overlap(last.split(), text.split())
+            seen.add(last)
+            pieces.append(line)
+            if not overlap or sum(len(piece.split()) for piece in pieces) >= max_words \
+                    or line.endswith(dedupe.SENTENCE_ENDINGS):
+                segments.append((start, end, ' '.join(pieces)))
+                pieces = []
+            cut = len(' '.join(text.split()[:overlap])) + 1 if overlap else 0
+        if not pieces:
+            start = cue_start
+        last, end = text, cue_end
+    if last is not None:
+        segments.append((start, end, ' '.join(pieces + [last[cut:]])))
+    return segments
+
+
+def random_cues(rng: random.Random, count: int) -> list:
+    """Cues over a few words, so overlaps and repeats are frequent."""
+    words = ['a', 'b', 'ab', 'ba', 'end.']
+    cues, text = [], ''
+    for n in range(count):
+        roll = rng.random()
+        if text and roll < 0.3:
+            text += ' ' + rng.choice(words)
+        elif text and roll < 0.6:
+            tail = text.split()[-rng.randint(1, len(text.split())):]
+            text = ' '.join(tail + [rng.choice(words) for _ in range(rng.randint(0, 3))])
+        else:
+            text = ' '.join(rng.choice(words) for _ in range(rng.randint(1, 5)))
+        cues.append((100 * n, 100 * n + 100, text))
+    return cues
+
+
+def test_find_overlap_matches_brute_force():
+    rng = random.Random(0)
+    for _ in range(5000):
+        window = [rng.randrange(3) for _ in range(rng.randrange(10))]
+        tokens = [rng.randrange(3) for _ in range(rng.randrange(10))]
+        assert dedupe.find_overlap(window, tokens) == brute_overlap(window, tokens)
+
+
+def test_rolling_captions_are_stitched():
+    cues = [(0, 1000, 'hello there'),
+            (1000, 2000, 'hello there how are you'),
+            (2000, 3000, 'hello there how are you i am'),
+            (3000, 4000, 'i am fine thanks.'),
+            (4000, 5000, 'thanks. see you'),
+            (5000, 6000, 'see you soon'),
+            (6000, 7000, 'see you soon'),
+            (7000, 8000, 'something else')]
+
+    assert list(dedupe.iter_merge_overlaps(cues)) == [
+        (0, 4000, 'hello there how are you i am fine thanks.'),
+        (4000, 7000, 'see you soon'),
+        (7000, 8000, 'something else'),
+    ]
+
+
+@pytest.mark.parametrize('max_words', [3, dedupe.MAX_SEGMENT_WORDS])
+def test_overlap_engine_matches_brute_force(max_words):
+    rng = random.Random(max_words)
+    for _ in range(300):
+        cues = random_cues(rng, rng.randrange(1, 30))
+        assert list(dedupe.iter_merge_overlaps(cues, max_words=max_words)) \
+            == reference_merge(cues, max_words)
@@ -0,0 +1,231 @@
+"""
+Tests for download.py's playlist sharding, caption handling, disk budget
+and metadata cache.
+
+Run with: python -m pytest plugins/huginn/tests
+The download test needs the yt_dlp module and is skipped without it.
+"""
+
+import json
+import os
+import sys
+import threading
+import time
+from functools import partial
+from http.server import SimpleHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+
+import pytest
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "scripts"))
+
+import download  # noqa: E402
+
+
+PLAYLIST = "https://www.youtube.com/playlist?list=PLtest"
+
+
+class FlatListing:
+    """Engine stand-in that lists ``entries`` for any playlist URL."""
+
+    def __init__(self, entries: list):
+        self.entries = entries
+
+    def extract(self, urls: list, extra_args: list = ()):
+        for entry in self.entries:
+            yield entry, None
+
+
+def flat_entry(url: str, index: int, title: str) -> dict:
+    """A flat playlist entry as YouTube playlists and channels list them."""
+    return {"_type": "url", "ie_key": "Generic", "url": url, "id": f"clip{index}",
+            "title": title, "playlist": "Test", "playlist_id": "PLtest",
+            "playlist_index": index, "playlist_autonumber": index, "n_entries": 3}
+
+
+def test_url_entries_become_url_transparent():
+    listing = [flat_entry(f"https://example.com/clip{n}.mp4", n, f"Clip {n}")
+               for n in (1, 2, 3)]
+    urls, entries = download.expand_playlists([PLAYLIST], FlatListing(listing))
+
+    assert urls == [entry["url"] for entry in listing]
+    for entry in listing:
+        expanded = entries[entry["url"]]
+        assert expanded["_type"] == "url_transparent"
+        assert expanded["playlist_index"] == entry["playlist_index"]
+        assert expanded["title"] == entry["title"]
+
+
+def test_repeated_entries_keep_their_first_position():
+    listing = [flat_entry("https://example.com/a.mp4", 1, "A"),
+               flat_entry("https://example.com/b.mp4", 2, "B"),
+               flat_entry("https://example.com/a.mp4", 3, "A again")]
+    urls, entries = download.expand_playlists([PLAYLIST], FlatListing(listing))
+
+    assert entries["https://example.com/a.mp4"]["playlist_index"] == 1
+    assert entries["https://example.com/a.mp4"]["title"] == "A"
+
+
+@pytest.fixture
+def clip_server(tmp_path):
+    served = tmp_path / "served"
+    served.mkdir()
+    (served / "clip.mp4").write_bytes(os.urandom(16 * 1024))
+    handler = type("Handler", (SimpleHTTPRequestHandler,),
+                   {"log_message": lambda self, *args: None})
+    server = ThreadingHTTPServer(("127.0.0.1", 0),
+                                 partial(handler, directory=str(served)))
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    try:
+        yield f"http://127.0.0.1:{server.server_address[1]}/clip.mp4"
+    finally:
+        server.shutdown()
+        server.server_close()
+
+
+def test_url_entry_downloads_with_playlist_name(clip_server, tmp_path):
+    pytest.importorskip("yt_dlp")
+    output = tmp_path / "out"
+    urls, entries = download.expand_playlists(
+        [PLAYLIST], FlatListing([flat_entry(clip_server, 3, "Clip")]))
+    args = download.argparse.Namespace(
+        audio=None, quality=None, format=None, output=str(output), name=None,
+        range=None, playlist=True, channel=False, archive=None, subs=None,
+        thumb=False, meta=False, proxy=None, pipeline=False,
+        subs_only=False, auto_subs=False)
+    engine = download.EmbeddedEngine()
+    try:
+        success, failed, _ = download.run_downloads(
+            urls, download.build_command(args), prefetch=False, engine=engine,
+            entries=entries)
+    finally:
+        engine.close()
+
+    assert (success, failed) == (1, 0)
+    assert [path.name for path in output.iterdir()] == ["03 - Clip.mp4"]
+
+
+def test_present_subtitles_resolve_to_their_files():
+    monitor = download.DownloadMonitor("https://example.com/v")
+    monitor("[info] Writing video subtitles to: /out/Talk.de.vtt")
+    monitor("[info] Video subtitle en.vtt is already present")
+    monitor('[subtitles] ["/out/Talk.de.vtt", "/out/Talk.en.vtt"]')
+
+    assert monitor.subtitles == [Path("/out/Talk.de.vtt"), Path("/out/Talk.en.vtt")]
+
+
+class FixedDisk(download.DiskBudget):
+    """A DiskBudget over a volume with ``space`` bytes free."""
+
+    def __init__(self, space: int, watermark: int):
+        super().__init__(Path("."), watermark)
+        self.space = space
+
+    def free(self) -> int:
+        return self.space
+
+
+def sized_task(index: int, size: int) -> download.DownloadTask:
+    task = download.DownloadTask(index, f"https://example.com/{index}.mp4")
+    task.size = size
+    return task
+
+
+def test_download_under_the_watermark_starts_alone():
+    scheduler = download.HostScheduler(2, disk=FixedDisk(900 * 2**20, 2**30))
+    scheduler.add(sized_task(1, 5 * 2**20))
+
+    task = scheduler.next()
+    assert task.index == 1 and task.no_room is None
+
+
+def test_download_too_big_for_the_volume_fails():
+    scheduler = download.HostScheduler(2, disk=FixedDisk(900 * 2**20, 0))
+    scheduler.add(sized_task(1, 2**30))
+
+    assert scheduler.next().no_room == "needs 1.0 GB, 900.0 MB free"
+
+
+RECORDED = [
+    {"id": "dQw4w9WgXcQ", "extractor_key": "Youtube", "title": "Recorded video",
+     "webpage_url": "https://www.youtube.com/watch?v=dQw4w9WgXcQ", "epoch": 1700000000},
+    {"id": "clip1", "extractor_key": "Generic", "title": "Recorded clip",
+     "original_url": "https://example.com/clip1.mp4", "epoch": 1700000000},
+    {"id": "live1", "extractor_key": "Generic", "title": "Recorded stream",
+     "original_url": "https://example.com/live1", "is_live": True},
+]
+
+
+class NoNetwork:
+    """Engine stand-in that fails any extraction."""
+
+    def __init__(self):
+        self.children = download.ChildProcesses()
+        self.extracted = []
+
+    def extract(self, urls: list, extra_args: list = ()):
+        self.extracted.extend(urls)
+        raise AssertionError(f"extracted {urls}")
+
+
+class Clock:
+    """Stands in for the time module, with a settable time.time()."""
+
+    def __init__(self, now: float):
+        self.now = now
+
+    def time(self) -> float:
+        return self.now
+
+    def __getattr__(self, name):
+        return getattr(time, name)
+
+
+@pytest.fixture
+def cache(tmp_path, monkeypatch):
+    clock = Clock(time.time())
+    monkeypatch.setattr(download, "time", clock)
+    recorded = tmp_path / "recorded.jsonl"
+    recorded.write_text("".join(json.dumps(info) + "\n" for info in RECORDED))
+    with download.MetadataCache(tmp_path / "metadata.db") as cache:
+        assert cache.import_file(recorded) == len(RECORDED)
+        cache.clock = clock
+        yield cache
+
+
+def test_imported_entries_are_served_without_extracting(cache):
+    urls = ["https://youtu.be/dQw4w9WgXcQ", "https://example.com/clip1.mp4#t=5",
+            "https://example.com/live1"]
+    engine = NoNetwork()
+    with download.InfoPrefetcher(urls, engine, save=False, cache=cache) as prefetcher:
+        titles = [prefetcher.get(url)[0].get("title") for url in urls]
+
+    assert titles == ["Recorded video", "Recorded clip", "Recorded stream"]
+    assert engine.extracted == []
+
+
+def test_live_entries_expire_first(cache):
+    cache.clock.now += download.LIVE_CACHE_TTL + 1
+    assert cache.get("https://example.com/live1") is None
+    assert cache.get("https://example.com/clip1.mp4")[0]["title"] == "Recorded clip"
+
+    cache.clock.now += download.DEFAULT_CACHE_TTL
+    assert cache.get("https://example.com/clip1.mp4") is None
+
+
+def test_eviction_drops_least_recently_used(cache):
+    for n in range(10):
+        cache.clock.now += 1
+        cache.put(f"https://example.com/{n}", {"id": str(n), "pad": "x" * 1000})
+    cache.clock.now += 1
+    assert cache.get("https://example.com/0")
+
+    # Room for the entries used since 3 was put, so everything before goes
+    sizes = dict(cache.db.execute("SELECT key, LENGTH(data) FROM entries"))
+    kept = {f"generic:{n}" for n in (0, *range(3, 10))}
+    cache.max_bytes = sum(sizes[key] for key in kept)
+    cache._evict()
+
+    assert {key for key, in cache.db.execute("SELECT key FROM entries")} == kept
+    assert cache.get("https://example.com/1") is None
+    assert cache.get("https://example.com/clip1.mp4") is None